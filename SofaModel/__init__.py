@@ -1,3 +1,11 @@
 from SofaModel.base_model import BaseScene, BaseModel
-from SofaModel.sofa_deps import SOFAControl
 from SofaModel.visual import VisualStyle
+
+
+def __getattr__(name):
+    # SOFAControl subclasses Sofa.Core.Controller, import SOFA only when needed
+    if name == "SOFAControl":
+        from SofaModel.sofa_deps import SOFAControl
+
+        return SOFAControl
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,191 @@
+import copy
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+
+from SofaModel.checkpoint import controllers, get_state, set_state
+
+
+class StateChange:
+    """
+    Relative change of a Data field over one step, divided by `tol`
+    """
+
+    def __init__(self, path: str, data: str = "position", tol: float = 1e-3):
+        self.path = path
+        self.data = data
+        self.tol = tol
+        self._x0 = None
+
+    def _value(self, model):
+        return np.array(model.root[self.path].findData(self.data).value, dtype=float)
+
+    def before(self, model):
+        self._x0 = self._value(model)
+
+    def __call__(self, model, dt: float) -> float:
+        x1 = self._value(model)
+        scale = np.linalg.norm(self._x0) or 1.0
+        return np.linalg.norm(x1 - self._x0) / scale / self.tol
+
+
+class DataRatio:
+    """
+    Value of a Data field (e.g. the iterations used by a solver) divided by
+    `target`, reduced with max for vector Data
+    """
+
+    def __init__(self, path: str, data: str, target: float):
+        self.path = path
+        self.data = data
+        self.target = target
+
+    def before(self, model):
+        pass
+
+    def __call__(self, model, dt: float) -> float:
+        value = model.root[self.path].findData(self.data).value
+        return float(np.max(value)) / self.target
+
+
+def _walk(node):
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+
+class AdaptiveStepper:
+    """
+    Advance the simulation up to `t_end` with a step size driven by `estimator`,
+    an object with `before(model)` and `__call__(model, dt) -> error` where an
+    error <= 1 accepts the step. A rejected step is rolled back (MechanicalObject
+    states, time and the state of the controllers, see SOFAControl.get_state)
+    and retried with a smaller dt, down to `dt_min`. An accepted attempt is kept
+    as is, the controllers only export it once accepted.
+    Components with an internal state that cannot be rolled back (the types of
+    `STATEFUL`, e.g. the windkessel of PressureConstraintForceField) are
+    refused by `start`.
+    Accepted and rejected steps are logged to `adaptive_steps.csv`.
+    """
+
+    STATEFUL = {
+        "PressureConstraintForceField",
+        "ProjectivePressureConstraint",
+        "ContractionForceField",
+        "ContractionCouplingForceField",
+        "CardiacSimulationExporter",
+    }
+
+    def __init__(
+        self,
+        estimator,
+        t_end: float,
+        dt_min: float,
+        dt_max: float,
+        dt0: Optional[float] = None,
+        safety: float = 0.9,
+        grow: float = 2.0,
+        shrink: float = 0.25,
+        order: int = 1,
+    ):
+        self.estimator = estimator
+        self.t_end = t_end
+        self.dt_min = dt_min
+        self.dt_max = dt_max
+        self.dt0 = dt0
+        self.safety = safety
+        self.grow = grow
+        self.shrink = shrink
+        self.order = order
+        self.dt = None
+        self.accepted = 0
+        self.rejected = 0
+        self._log = None
+        self.controllers = []
+        self._first = True
+
+    def start(self, model):
+        stateful = sorted(
+            f"{obj.getClassName()} {obj.getPathName()}"
+            for node in _walk(model.root)
+            for obj in node.objects
+            if obj.getClassName() in self.STATEFUL
+        )
+        if stateful:
+            raise ValueError(
+                "Adaptive stepping cannot roll back the internal state of "
+                + ", ".join(stateful)
+            )
+        self.controllers = controllers(model.root)
+        for ctrl in self.controllers:
+            ctrl.hold_exports = True
+        self._first = True
+        self.dt = self.dt0 or model.params.dt.value
+        self.dt = min(max(self.dt, self.dt_min), self.dt_max)
+        path = os.path.join(str(model.out), "adaptive_steps.csv")
+        self._log = open(path, "a", buffering=1)
+        if self._log.tell() == 0:
+            self._log.write("step,time,dt,error,accepted\n")
+
+    def done(self, model) -> bool:
+        return model.root.time.value >= self.t_end * (1 - 1e-12)
+
+    def _factor(self, err: float) -> float:
+        if err <= 0:
+            return self.grow
+        return self.safety * err ** (-1 / (self.order + 1))
+
+    def get_state(self):
+        return {"dt": self.dt, "accepted": self.accepted, "rejected": self.rejected}
+
+    def set_state(self, state):
+        self.__dict__.update(state)
+
+    def advance(self, model):
+        root = model.root
+        if self._first and model.step == 0:  # the initial export, see SOFAControl
+            for ctrl in self.controllers:
+                ctrl.export()
+        self._first = False
+        while True:
+            t0 = root.time.value
+            dt = min(self.dt, self.t_end - t0)
+            state = get_state(root)
+            saved = [copy.deepcopy(c.get_state()) for c in self.controllers]
+            self.estimator.before(model)
+
+            root.findData("dt").value = dt
+            model.animate(dt)
+            err = self.estimator(model, dt)
+
+            ok = err <= 1 or dt <= self.dt_min * (1 + 1e-9)
+            self._log.write(f"{model.step},{t0},{dt},{err},{int(ok)}\n")
+            if ok:
+                self.accepted += 1
+                for ctrl in self.controllers:
+                    ctrl.export()
+                factor = min(self.grow, self._factor(err))
+                self.dt = min(self.dt_max, max(self.dt_min, dt * factor))
+                return dt
+
+            self.rejected += 1
+            set_state(root, state)
+            root.time.value = t0
+            for ctrl, ctrl_state in zip(self.controllers, saved):
+                ctrl.set_state(ctrl_state)
+            self.dt = max(self.dt_min, dt * max(self.shrink, self._factor(err)))
+
+    def finish(self, model):
+        for ctrl in self.controllers:
+            ctrl.hold_exports = False
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        log.info(
+            f"Adaptive stepping: {self.accepted} accepted, {self.rejected} rejected"
+        )
+
+
+log = logging.getLogger(__name__)
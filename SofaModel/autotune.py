@@ -0,0 +1,314 @@
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import treefiles as tf
+
+from SofaModel.hooks import RunHook
+from SofaModel.stopping import read
+from SofaModel.sweep import class_path, load_class
+
+SOLVER_CONFIG = "solver_config.json"
+
+
+def candidates(iterations: int = 200) -> Dict[str, List[dict]]:
+    """
+    Linear solver configurations tried by default, as lists of objects replacing
+    the tuned solver. "{name}" in a string is replaced by the solver name
+    """
+    cg = lambda tol: [
+        {
+            "type": "CGLinearSolver",
+            "template": "GraphScattered",
+            "iterations": iterations,
+            "tolerance": tol,
+            "threshold": tol,
+        }
+    ]
+    pcg = lambda precond: [
+        {
+            "type": "ShewchukPCGLinearSolver",
+            "iterations": iterations,
+            "tolerance": 1e-9,
+            "preconditioners": "@{name}_precond",
+            "update_step": 1,
+        },
+        {"type": precond, "name": "{name}_precond"},
+    ]
+    sparse = {"template": "CompressedRowSparseMatrixMat3x3d"}
+    return {
+        "cg-1e-12": cg(1e-12),
+        "cg-1e-9": cg(1e-9),
+        "cg-1e-7": cg(1e-7),
+        "cg-1e-5": cg(1e-5),
+        "pcg-jacobi": pcg("JacobiPreconditioner"),
+        "pcg-ssor": pcg("SSORPreconditioner"),
+        "ldl": [{"type": "SparseLDLSolver", **sparse}],
+        "cholesky": [{"type": "SparseCholeskySolver", **sparse}],
+    }
+
+
+def solver_objects(objects: List[dict], name: str, **common) -> List[Tuple[str, dict]]:
+    """
+    (type, kwargs) of a solver configuration named `name`, `common` (e.g. tags)
+    added to every object
+    """
+    out = []
+    for i, obj in enumerate(objects):
+        kwargs = {
+            k: v.format(name=name) if isinstance(v, str) else v
+            for k, v in obj.items()
+            if k != "type"
+        }
+        if i == 0:
+            kwargs["name"] = name
+        for k, v in common.items():
+            kwargs.setdefault(k, v)
+        out.append((obj["type"], kwargs))
+    return out
+
+
+class _Trace(RunHook):
+    """
+    Field values and time spent in model.animate per step, the other hooks are
+    not counted
+    """
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.times = []
+        self.values = []
+        self._spent = 0.0
+
+    def start(self, model):
+        self.values.append(np.array(read(model, self.path, self.data), dtype=float))
+        animate = model.animate
+
+        def timed(dt):
+            t = time.perf_counter()
+            try:
+                animate(dt)
+            finally:
+                self._spent += time.perf_counter() - t
+
+        model.animate = timed
+
+    def before_step(self, model):
+        self._spent = 0.0
+
+    def after_step(self, model):
+        self.times.append(self._spent)
+        self.values.append(np.array(read(model, self.path, self.data), dtype=float))
+
+    def finish(self, model):
+        model.__dict__.pop("animate", None)
+
+
+def run_candidate(job: dict) -> dict:
+    """
+    Worker entry point, run the scene for a few steps with one configuration
+    """
+    row = {"name": job["name"], "out_dir": job["out_dir"]}
+    try:
+        params = tf.Params.from_dict(job["params"])
+        params.add("n", job["steps"])
+        params.add("out_dir", job["out_dir"])
+        params.add("SOLVER_CONFIG", {job["target"]: job["objects"]})
+
+        model = load_class(job["model"])(params, load_class(job["scene"])())
+        trace = _Trace(*job["field"])
+        model.hooks.append(trace)
+        model.run()
+
+        times = trace.times[1:] or trace.times  # the first step assembles
+        row["status"] = "done"
+        row["step_s"] = float(np.median(times))
+        row["trace"] = os.path.join(job["out_dir"], "trace.npy")
+        np.save(row["trace"], np.stack(trace.values))
+    except BaseException as e:
+        row["status"] = "failed"
+        row["error"] = f"{type(e).__name__}: {e}"
+        row["traceback"] = traceback.format_exc()
+    return row
+
+
+def deviation(trace: np.ndarray, reference: np.ndarray) -> float:
+    """
+    Largest distance to the reference over the steps, relative to the largest
+    displacement of the reference
+    """
+    n = min(len(trace), len(reference))
+    scale = max(
+        float(np.linalg.norm(reference[i] - reference[0])) for i in range(n)
+    )
+    diff = max(float(np.linalg.norm(trace[i] - reference[i])) for i in range(n))
+    return diff / (scale or 1.0)
+
+
+class SolverTuner:
+    """
+    Run a short window of the scene once per linear solver configuration of
+    `target` (the name given to BaseScene.add_linear_solver), each in a fresh
+    process, and keep the fastest one deviating from `reference` by less than
+    `budget` on `field`. The choice is merged into out/solver_config.json, to be
+    passed as the SOLVER_CONFIG parameter of production runs
+    """
+
+    def __init__(
+        self,
+        model,
+        scene,
+        params: tf.Params,
+        target: str,
+        field: Tuple[str, str],
+        out,
+        steps: int = 20,
+        budget: float = 1e-3,
+        configs: Optional[Dict[str, List[dict]]] = None,
+        reference: str = "cg-1e-12",
+    ):
+        self.model = class_path(model)
+        self.scene = class_path(scene)
+        self.params = params if isinstance(params, tf.Params) else tf.Params(params)
+        self.target = target
+        self.field = tuple(field)
+        self.out = tf.dump(out)
+        self.steps = steps
+        self.budget = budget
+        self.configs = candidates() if configs is None else configs
+        if reference not in self.configs:
+            raise KeyError(f"Reference {reference!r} is not among the candidates")
+        self.reference = reference
+        self.results: List[dict] = []
+
+    def jobs(self) -> List[dict]:
+        base = self.params.to_dict()
+        base.pop("SOLVER_CONFIG", None)
+        return [
+            {
+                "name": name,
+                "model": self.model,
+                "scene": self.scene,
+                "params": base,
+                "steps": self.steps,
+                "target": self.target,
+                "objects": objects,
+                "field": self.field,
+                "out_dir": str(tf.dump(self.out / self.target / name).abs()),
+            }
+            for name, objects in self.configs.items()
+        ]
+
+    @tf.timer
+    def run(self) -> Optional[dict]:
+        # one at a time, the timings are compared
+        results = []
+        for job in self.jobs():
+            with ProcessPoolExecutor(1, mp_context=mp.get_context("spawn")) as pool:
+                row = pool.submit(run_candidate, job).result()
+            log.info(
+                f"{row['name']}: {row['status']}"
+                + (f", {1e3 * row['step_s']:.1f} ms/step" if "step_s" in row else "")
+            )
+            results.append(row)
+
+        ref = next(r for r in results if r["name"] == self.reference)
+        if ref["status"] != "done":
+            raise RuntimeError(f"Reference {self.reference} failed: {ref['error']}")
+        reference = np.load(ref["trace"])
+        for r in results:
+            if r["status"] == "done":
+                r["deviation"] = deviation(np.load(r.pop("trace")), reference)
+                r["accepted"] = r["deviation"] <= self.budget
+        self.results = results
+
+        ok = [r for r in results if r.get("accepted")]
+        best = min(ok, key=lambda r: r["step_s"]) if ok else None
+        tf.dump_json(
+            self.out / "solver_tuning.json",
+            {
+                "target": self.target,
+                "field": self.field,
+                "steps": self.steps,
+                "budget": self.budget,
+                "reference": self.reference,
+                "best": best and best["name"],
+                "results": results,
+            },
+            cls=tf.JsonEncoder,
+        )
+        log.info(f"Solver tuning of {self.target!r}:\n{self.table()}")
+        if best is None:
+            log.warning(f"No configuration of {self.target!r} within {self.budget}")
+            return None
+
+        path = self.out / SOLVER_CONFIG
+        config = tf.load_json(path) if tf.isfile(path) else {}
+        config[self.target] = self.configs[best["name"]]
+        tf.dump_json(path, config, cls=tf.JsonEncoder)
+        return best
+
+    def table(self) -> str:
+        header = ["name", "status", "ms/step", "deviation", "accepted"]
+        lines = [
+            [
+                r["name"],
+                r["status"],
+                f"{1e3 * r['step_s']:.2f}" if "step_s" in r else "",
+                f"{r['deviation']:.3g}" if "deviation" in r else "",
+                "yes" if r.get("accepted") else r.get("error", "no"),
+            ]
+            for r in self.results
+        ]
+        widths = [max(len(x) for x in col) for col in zip(header, *lines)]
+        fmt = lambda row: "  ".join(x.ljust(w) for x, w in zip(row, widths))
+        sep = "  ".join("-" * w for w in widths)
+        return "\n".join([fmt(header), sep, *map(fmt, lines)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pick the fastest linear solver")
+    parser.add_argument("model", help="BaseModel subclass, 'module:Class'")
+    parser.add_argument("scene", help="BaseScene subclass, 'module:Class'")
+    parser.add_argument("params", help="Base params.json")
+    parser.add_argument("out", help="Output directory")
+    parser.add_argument("--target", required=True, help="Name of the linear solver")
+    parser.add_argument(
+        "--field",
+        required=True,
+        metavar="PATH.DATA",
+        help="Data compared to the reference, e.g. MecaNode/mecaObj.position",
+    )
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=1e-3)
+    parser.add_argument("--configs", help="Json file of candidate configurations")
+    parser.add_argument("--reference", default="cg-1e-12")
+    args = parser.parse_args(argv)
+
+    tuner = SolverTuner(
+        args.model,
+        args.scene,
+        tf.Params.from_dict(tf.load_json(args.params)),
+        args.target,
+        args.field.rsplit(".", 1),
+        args.out,
+        steps=args.steps,
+        budget=args.budget,
+        configs=tf.load_json(args.configs) if args.configs else None,
+        reference=args.reference,
+    )
+    return 0 if tuner.run() is not None else 1
+
+
+log = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -1,19 +1,53 @@
-import io
 import logging
+import os
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import treefiles as tf
 
+from SofaModel.adaptive import AdaptiveStepper
+from SofaModel.capture import std_capture
+from SofaModel.checkpoint import Checkpointer
+from SofaModel.hooks import RunHook
+from SofaModel.load_SOFA import load_SOFA
+from SofaModel.memory import MemoryMonitor
+from SofaModel.metrics import RunMetrics
+from SofaModel.multirate import MultiRate
+from SofaModel.plugins import scene_plugins
+from SofaModel.profiling import Profiler
+from SofaModel.registry import RunRegistry
+from SofaModel.stopping import StoppingCriterion
+from SofaModel.threads import ParallelNode, set_thread_env, threads_param
+
 
 class BaseScene:
+    # Plugins imported for this scene, None falls back to the model's mode
+    PLUGINS: Optional[Set[str]] = None
+    # Linear solver configurations used by add_linear_solver, name -> objects,
+    # updated by the SOLVER_CONFIG parameter (see SofaModel.autotune)
+    SOLVERS: Dict[str, List[dict]] = {}
+    # With threads > 1, solve the ODEs of the solver subgraphs concurrently. Only
+    # valid when they do not read each other's Data during a step
+    PARALLEL_ODE = False
+    # Sub-cycled solver nodes, path -> number of sub-steps per model step, and
+    # the Data of the other nodes they read, interpolated over the sub-steps
+    SUBSTEPS: Dict[str, int] = {}
+    INTERPOLATE: Dict[str, List[Tuple[str, str]]] = {}
+
     def __init__(self):
         self.ra = None
+        self.params = None
         self.root = None
         self.controller = None
+        self.exporter = None
 
     def real_init(self, root, params):
+        threads = threads_param(params)
+        if threads > 1:
+            root = ParallelNode(root, threads, self.PARALLEL_ODE)
         self.ra = lambda x: params[x].value
+        self.params = params
         self.root = root
         self.root.findData("dt").value = self.ra("dt")
         self.root.findData("gravity").value = [0, 0, 0]
@@ -24,6 +58,53 @@ class BaseScene:
     def init(self):
         pass
 
+    def substeps(self) -> Dict[str, int]:
+        return dict(self.SUBSTEPS)
+
+    def solver_config(self) -> Dict[str, List[dict]]:
+        config = dict(self.SOLVERS)
+        if "SOLVER_CONFIG" in self.params:
+            tuned = self.ra("SOLVER_CONFIG")
+            config.update(tuned if isinstance(tuned, dict) else tf.load_json(tuned))
+        return config
+
+    def add_linear_solver(self, node, name: str, tags=None, **kwargs):
+        """
+        Linear solver `name` of the tuned configuration if any, else a
+        CGLinearSolver with `kwargs`
+        """
+        from SofaModel.autotune import solver_objects
+
+        objects = self.solver_config().get(name)
+        if objects is None:
+            objects = [{"type": "CGLinearSolver", **kwargs}]
+        common = {} if tags is None else {"tags": tags}
+        added = [
+            node.addObject(type_name, **kw)
+            for type_name, kw in solver_objects(objects, name, **common)
+        ]
+        return added[0]
+
+    def add_exports(self, config, directory=None):
+        """
+        Export Data as described by an ExportConfig (or its dict or json file),
+        to out_dir/exports by default
+        """
+        from SofaModel.export import ExportConfig
+        from SofaModel.sofa_deps import ConfiguredExporter
+
+        if isinstance(config, dict):
+            config = ExportConfig.from_dict(config)
+        elif not isinstance(config, ExportConfig):
+            config = ExportConfig.load(config)
+        if directory is None:
+            directory = os.path.join(str(self.ra("out_dir")), "exports")
+        self.exporter = ConfiguredExporter(
+            self.root, config, directory, name="exporter"
+        )
+        self.root.addObject(self.exporter)
+        return self.exporter
+
 
 PLUGINS = {
     "Sofa.Component.ODESolver.Backward",
@@ -35,6 +116,8 @@ PLUGINS = {
 
 class BaseModel:
     PLUGINS = PLUGINS
+    # "global": legacy plugin imports, "auto": derived from the scene components
+    PLUGIN_MODE = "global"
 
     def save_params(self):
         tf.dump_json(
@@ -48,6 +131,13 @@ class BaseModel:
         self.params = params if isinstance(params, tf.Params) else tf.Params(params)
         self.root = None
         self.scene = scene
+        self.timings = {}
+        self.hooks: List[RunHook] = []
+        self.step = 0
+        self.stepper: Optional[AdaptiveStepper] = None
+        self.multirate: Optional[MultiRate] = None
+        self.stop_reason: Optional[str] = None
+        self.converged = False
 
         if "n" not in self.params:
             log.warning("Iteration number not set, defaulting to n=10")
@@ -69,32 +159,60 @@ class BaseModel:
         self.set_data_path()  # add path related params
         self.init()
 
+    def load_sofa(self):
+        if "sofa" in self.timings:
+            return
+        t = time.perf_counter()
+        if threads_param(self.params) > 1:
+            set_thread_env(threads_param(self.params))
+        load_SOFA()
+        import Sofa.Core
+        import Sofa.Simulation
+
+        self.timings["sofa"] = time.perf_counter() - t
+        log.info(f"SOFA imported in {self.timings['sofa']:.2f}s")
+
+    def required_plugins(self) -> Optional[Set[str]]:
+        if self.scene.PLUGINS is not None:
+            return set(self.scene.PLUGINS)
+        if self.PLUGIN_MODE == "auto":
+            return scene_plugins(self.scene, self.params)
+
     def init_scene(self):
         """
         graph: create_graph(root: Node, params: tf.TParams)
         """
+        self.load_sofa()
         from Sofa import Simulation
         from Sofa.Core import Node
         import SofaRuntime
-        # from SofaRuntime.SofaRuntime import importPlugin
 
         self.root = Node("root")
 
         SofaRuntime.PluginRepository.addFirstPath(tf.env("SOFA_ROOT") / "lib")
         # SofaRuntime.DataRepository.addFirstPath(tf.env("SOFA_ROOT") / "bin")
 
-        SofaRuntime.importPlugin("SofaImplicitOdeSolver")
-        SofaRuntime.importPlugin("Sofa.Component.ODESolver.Backward")
-        self.root.addObject("RequiredPlugin", name="SofaImplicitOdeSolver")
-
-        # for x in self.plugins:
-        #     SofaRuntime.importPlugin(x)
-        #     # self.root.addObject("RequiredPlugin", name=x)
+        t = time.perf_counter()
+        plugins = self.required_plugins()
+        if plugins is None:
+            SofaRuntime.importPlugin("SofaImplicitOdeSolver")
+            SofaRuntime.importPlugin("Sofa.Component.ODESolver.Backward")
+            self.root.addObject("RequiredPlugin", name="SofaImplicitOdeSolver")
+        else:
+            for x in sorted(plugins):
+                SofaRuntime.importPlugin(x)
+        self.timings["plugins"] = time.perf_counter() - t
+        log.info(
+            f"Plugins {sorted(plugins or ['SofaImplicitOdeSolver'])} "
+            f"imported in {self.timings['plugins']:.2f}s"
+        )
 
         # self.scene = self.scene_class(self.root, self.params)
+        t = time.perf_counter()
         self.scene.real_init(self.root, self.params)
         self.scene.init()
         Simulation.init(self.root)
+        self.timings["init_scene"] = time.perf_counter() - t
 
     def set_data_path(self):
         pass
@@ -108,11 +226,60 @@ class BaseModel:
         pass
 
     @tf.timer
-    def run(self, gui: bool = False, std_to_file: bool = False):
-        from Model3D.basesofamodel.load_SOFA import load_SOFA
+    def run(
+        self,
+        gui: bool = False,
+        std_to_file: bool = False,
+        log_max_bytes: Optional[int] = None,
+        log_backups: int = 1,
+        checkpoint_every: Optional[int] = None,
+        checkpoint_keep: int = 2,
+        resume: bool = False,
+        profile: int = 0,
+        memory: int = 0,
+        metrics: float = 0,
+        metrics_port: Optional[int] = None,
+        metrics_host: str = "127.0.0.1",
+        adaptive: Optional[AdaptiveStepper] = None,
+        stop: Iterable[StoppingCriterion] = (),
+        registry: Optional[RunRegistry] = None,
+        force: bool = False,
+    ):
+        """
+        :param gui: interactive run in the SOFA GUI, the other options and the
+            hooks only apply to batch runs and are ignored with a warning
+        :param std_to_file: stream stdout/stderr (Python and C++) to files in out_dir
+        :param log_max_bytes: rotate the std files when they reach this size
+        :param log_backups: number of rotated files to keep, 0 truncates instead
+        :param checkpoint_every: write the simulation state every n steps
+        :param checkpoint_keep: number of checkpoints kept on disk, at least 1
+        :param resume: restart from the latest checkpoint in out_dir/checkpoints,
+            appending to the std files and the result stores of the first run
+        :param profile: time the SOFA components every `profile` steps, 0 disables
+        :param memory: sample rss and python memory every `memory` steps to
+            memory.csv and memory_summary.json, warn on steady growth. 0 disables
+        :param metrics: rewrite out_dir/metrics.json (step, time, rate, eta, solver
+            iterations, memory) every `metrics` seconds, 0 disables
+        :param metrics_port: also serve the metrics in Prometheus format on this
+            port, 0 picks a free one
+        :param metrics_host: interface of the metrics endpoint, local only by
+            default, "0.0.0.0" exposes it on every interface
+        :param adaptive: adapt dt and run until `adaptive.t_end` instead of n steps
+        :param stop: criteria ending the run early, the reason is saved to stop.json
+        :param registry: skip the run if the same one already completed, and
+            register it once completed. Returns the registry entry, None when
+            the run was cut short
+        :param force: run even if the registry has a completed run
+        """
+        key = None
+        if registry is not None and not gui:
+            key = registry.key(self)
+            entry = None if force else registry.lookup(key)
+            if entry is not None:
+                log.info(f"Run already completed in file://{entry['out_dir']}")
+                return dict(entry, cached=True)
 
-        load_SOFA()
-        from Sofa import Simulation
+        self.load_sofa()
 
         log.info(f"Starting Model at file://{self.params.out_dir.value}")
 
@@ -121,6 +288,23 @@ class BaseModel:
         if gui:
             from Sofa.Gui import GUIManager
 
+            batch = {
+                "hooks": self.hooks,
+                "std_to_file": std_to_file,
+                "checkpoint_every": checkpoint_every or resume,
+                "profile": profile,
+                "memory": memory,
+                "metrics": metrics or metrics_port is not None,
+                "adaptive": adaptive,
+                "stop": list(stop),
+                "registry": registry,
+            }
+            ignored = [k for k, v in batch.items() if v]
+            if ignored:
+                log.warning(
+                    f"The GUI drives the animation loop, ignoring {', '.join(ignored)}"
+                )
+
             self.init_scene()
             GUIManager.Init("")
             GUIManager.createGUI(self.root, __file__)
@@ -132,31 +316,136 @@ class BaseModel:
             tf.removeIfExists(self.out.p / "lastUsedGUI.ini")
             tf.removeIfExists(self.out.p / "runSofa.ini")
         else:
-            log.info(f"Starting SOFA for {self.params.n.value} iterations")
+            self.stepper = adaptive
+            if adaptive is None:
+                log.info(f"Starting SOFA for {self.params.n.value} iterations")
+            else:
+                log.info(f"Starting SOFA with adaptive dt until t={adaptive.t_end}")
+
+            hooks = list(self.hooks)
+            if profile:
+                hooks.append(Profiler(self.out, every=profile))
+            if memory:
+                hooks.append(MemoryMonitor(self.out, every=memory))
+            hooks.extend(stop)
+            if metrics or metrics_port is not None:
+                hooks.append(
+                    RunMetrics(self.out, metrics or 5.0, metrics_port, metrics_host)
+                )
+            if checkpoint_every or resume:  # last, restores the other hooks
+                hooks.append(
+                    Checkpointer(
+                        self.out / "checkpoints",
+                        checkpoint_every,
+                        checkpoint_keep,
+                        resume,
+                        hooks,
+                    )
+                )
 
             if std_to_file:
-                out = self.params.out_dir / "Output_Python.stdout"
-                err = self.params.out_dir / "Error_Python.stderr"
-
-                fo, fe = open(out, "w"), open(err, "w")
-                fob, feb = io.BytesIO(), io.BytesIO()
-                with tf.stdout_redirector(fob):
-                    with tf.stderr_redirector(feb):
-                        self.init_scene()
-                        print(f"Starting {self.params.n.value} iterations")
-                        for i in range(self.params.n.value):
-                            print(
-                                f"{datetime.now()}: Iterations {i+1}/{self.params.n.value}"
-                            )
-                            Simulation.animate(self.root, self.params.dt.value)
-                fo.write(fob.getvalue().decode("utf-8"))
-                fe.write(feb.getvalue().decode("utf-8"))
-                fo.close()
-                fe.close()
+                out_dir = self.params.out_dir.value
+                with std_capture(out_dir, log_max_bytes, log_backups, append=resume):
+                    self.simulate(hooks, verbose=True)
             else:
-                self.init_scene()
-                for _ in range(self.params.n.value):
-                    Simulation.animate(self.root, self.params.dt.value)
+                self.simulate(hooks)
+
+            if registry is not None:
+                return registry.record(self, key)
+
+    def stop(self, reason: str, converged: bool = False):
+        """
+        End the run after the current step, `converged` when it stops on a
+        result rather than cutting the run short
+        """
+        if self.stop_reason is None:
+            self.stop_reason = reason
+            self.converged = converged
+            log.info(f"Stopping at step {self.step}: {reason}")
+
+    def save_stop(self, reason: str):
+        tf.dump_json(
+            self.params.out_dir / "stop.json",
+            {
+                "reason": reason,
+                "step": self.step,
+                "time": self.root.time.value,
+                "early": self.stop_reason is not None,
+                "converged": self.converged,
+            },
+            cls=tf.JsonEncoder,
+        )
+
+    def finished(self) -> bool:
+        if self.stop_reason is not None:
+            return True
+        if self.stepper is not None:
+            return self.stepper.done(self)
+        return self.step >= self.params.n.value
+
+    def progress(self) -> str:
+        if self.stepper is not None:
+            t = self.root.time.value
+            return f"Iteration {self.step+1}, t={t:.6g}/{self.stepper.t_end}"
+        return f"Iterations {self.step+1}/{self.params.n.value}"
+
+    def animate(self, dt: float):
+        """
+        Advance the scene by dt, sub-cycling the nodes of `scene.substeps()`
+        """
+        if self.multirate is None:
+            from Sofa import Simulation
+
+            Simulation.animate(self.root, dt)
+        else:
+            self.multirate.animate(self, dt)
+
+    def simulate(self, hooks=(), verbose: bool = False):
+        self.init_scene()
+        self.step = 0
+        self.stop_reason = None
+        self.converged = False
+        self.multirate = None
+        substeps = {p: k for p, k in self.scene.substeps().items() if k > 1}
+        if substeps:
+            self.multirate = MultiRate(substeps, self.scene.INTERPOLATE)
+            self.multirate.start(self)
+        if self.stepper is not None:
+            self.stepper.start(self)
+        for h in hooks:
+            h.start(self)
+
+        if verbose:
+            print(f"Starting {self.params.n.value} iterations", flush=True)
+        try:
+            while not self.finished():
+                for h in hooks:
+                    h.before_step(self)
+                if verbose:
+                    print(f"{datetime.now()}: {self.progress()}", flush=True)
+                if self.stepper is None:
+                    self.animate(self.params.dt.value)
+                else:
+                    self.stepper.advance(self)
+                self.step += 1
+                for h in hooks:
+                    h.after_step(self)
+        except BaseException as e:
+            self.save_stop(f"error: {type(e).__name__}: {e}")
+            raise
+        else:
+            self.save_stop(self.stop_reason or "completed")
+        finally:
+            try:
+                for h in hooks:
+                    h.finish(self)
+                if self.stepper is not None:
+                    self.stepper.finish(self)
+            finally:  # flush the pending exports even if a hook failed
+                exporter = getattr(self.scene, "exporter", None)
+                for ctrl in (self.scene.controller, exporter):
+                    if ctrl is not None:
+                        ctrl.close_exports()
 
 
 log = logging.getLogger(__name__)
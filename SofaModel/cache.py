@@ -0,0 +1,193 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+
+def file_digest(path, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def params_digest(obj) -> str:
+    text = json.dumps(obj, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class InputCache:
+    """
+    Shared on-disk cache of generated or preprocessed inputs. An entry is a
+    directory named by the hash of what produced it (generator parameters and/or
+    input file contents), created once under a file lock so concurrent workers
+    wait for the first one instead of duplicating the work.
+    Entries are hard-linked into run directories (symlinked across file
+    systems, such links break if the entry is evicted), and the least recently
+    used ones are removed when the cache grows over `max_bytes`.
+    """
+
+    def __init__(self, root=None, max_bytes: Optional[int] = None):
+        if root is None:
+            root = os.environ.get(
+                "SOFAMODEL_CACHE", os.path.expanduser("~/.cache/sofamodel")
+            )
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(self.root, "locks"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "digests"), exist_ok=True)
+
+    def key(self, *parts, files: Iterable = ()) -> str:
+        return params_digest([parts, [self.digest(f) for f in files]])
+
+    def digest(self, path) -> str:
+        """
+        Content digest of a file, memoized by path, size and modification time
+        so the inputs shared by the runs of a sweep are read once
+        """
+        st = os.stat(path)
+        memo = os.path.join(
+            self.root,
+            "digests",
+            params_digest([os.path.realpath(path), st.st_size, st.st_mtime_ns]),
+        )
+        try:
+            with open(memo) as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        digest = file_digest(path)
+        tmp = f"{memo}.tmp{os.getpid()}"
+        with open(tmp, "w") as f:
+            f.write(digest)
+        os.replace(tmp, memo)
+        return digest
+
+    def entry(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    @contextmanager
+    def lock(self, key: str, blocking: bool = True):
+        with open(os.path.join(self.root, "locks", f"{key}.lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get_or_create(self, key: str, name: str, create: Callable[[str], None]) -> str:
+        """
+        Path of `name` in the entry `key`, calling `create(path)` to write it
+        the first time. Files of an entry are added one by one, never replacing
+        the ones already there (same content under another name)
+        """
+        entry = self.entry(key)
+        path = os.path.join(entry, name)
+        for _ in range(2):
+            if not os.path.exists(path):
+                with self.lock(key):
+                    if not os.path.exists(path):
+                        self._create(entry, name, create)
+                self.evict(keep=key)
+            try:
+                os.utime(entry)  # LRU clock
+                return path
+            except FileNotFoundError:  # evicted in between
+                continue
+        raise RuntimeError(f"Cache entry {key} evicted while in use")
+
+    def _create(self, entry: str, name: str, create: Callable[[str], None]):
+        # written in a private directory, under its final name for the creators
+        # relying on the extension, then moved into the entry
+        tmp = os.path.join(entry, f".tmp{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        try:
+            t = time.perf_counter()
+            create(os.path.join(tmp, name))
+            os.replace(os.path.join(tmp, name), os.path.join(entry, name))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        log.info(
+            f"Cached {name!r} in {time.perf_counter() - t:.2f}s (file://{entry})"
+        )
+
+    def add_file(self, src, dst=None) -> str:
+        """
+        Content-addressed copy of an existing file, returns its cache path or,
+        with `dst`, links it there (see `fetch`)
+        """
+        key = self.key("file", files=[src])
+        name = os.path.basename(src)
+        copy = lambda p: shutil.copyfile(src, p)
+        if dst is None:
+            return self.get_or_create(key, name, copy)
+        return self.fetch(key, name, copy, dst)
+
+    @staticmethod
+    def link(src, dst):
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            os.symlink(os.path.abspath(src), dst)
+
+    def fetch(self, key: str, name: str, create: Callable[[str], None], dst) -> str:
+        """
+        `get_or_create` then link the cached file to `dst`
+        """
+        for _ in range(2):
+            try:
+                path = self.get_or_create(key, name, create)
+                self.link(path, dst)
+                return str(dst)
+            except (FileNotFoundError, RuntimeError):  # evicted in between
+                continue
+        raise RuntimeError(f"Could not link cache entry {key} to {dst}")
+
+    def entries(self):
+        for sub in os.listdir(self.root):
+            d = os.path.join(self.root, sub)
+            if sub in ("locks", "digests") or not os.path.isdir(d):
+                continue
+            for key in os.listdir(d):
+                if ".tmp" not in key:
+                    yield key, os.path.join(d, key)
+
+    def evict(self, keep: Optional[str] = None):
+        if self.max_bytes is None:
+            return
+        sizes = {}
+        for key, entry in self.entries():
+            sizes[key] = (
+                os.path.getmtime(entry),
+                sum(
+                    os.path.getsize(os.path.join(r, f))
+                    for r, _, fs in os.walk(entry)
+                    for f in fs
+                ),
+                entry,
+            )
+        total = sum(s for _, s, _ in sizes.values())
+        for key in sorted(sizes, key=lambda k: sizes[k][0]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                with self.lock(key, blocking=False):
+                    shutil.rmtree(sizes[key][2], ignore_errors=True)
+            except BlockingIOError:  # being created or replaced by another worker
+                continue
+            total -= sizes[key][1]
+            log.debug(f"Evicted cache entry {key}")
+
+
+log = logging.getLogger(__name__)
@@ -0,0 +1,125 @@
+import ctypes
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager, ExitStack
+from typing import Optional
+
+
+def _flush_all():
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (AttributeError, ValueError):
+            pass
+    try:
+        ctypes.CDLL(None).fflush(None)  # C stdio buffers of the SOFA plugins
+    except (OSError, AttributeError):
+        pass
+
+
+class StreamCapture:
+    """
+    Redirect a file descriptor (1: stdout, 2: stderr) to a file at the OS level,
+    so the output of the C++ plugins is captured along with the Python one.
+
+    Without `max_bytes`, the descriptor is pointed at the file directly. With it,
+    the output goes through a pipe drained by a thread which writes fixed-size
+    chunks and rotates the file when it grows over `max_bytes`: the current file
+    is renamed to `path.1`, `path.1` to `path.2`, ... keeping `backups` files.
+    With `backups=0` the file is truncated instead. With `append`, the output
+    is added to an existing file (resumed runs).
+    """
+
+    def __init__(
+        self,
+        fd: int,
+        path,
+        max_bytes: Optional[int] = None,
+        backups: int = 1,
+        chunk: int = 1 << 16,
+        append: bool = False,
+    ):
+        self.fd = fd
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.chunk = chunk
+        self.append = append
+        self._saved = None
+        self._file = None
+        self._pipe = None
+        self._thread = None
+        self._size = 0
+
+    def __enter__(self):
+        _flush_all()
+        self._saved = os.dup(self.fd)
+        mode = os.O_APPEND if self.append else os.O_TRUNC
+        self._file = os.open(self.path, os.O_WRONLY | os.O_CREAT | mode, 0o644)
+        self._size = os.fstat(self._file).st_size
+
+        if self.max_bytes is None:
+            os.dup2(self._file, self.fd)
+        else:
+            r, w = os.pipe()
+            self._pipe = r
+            os.dup2(w, self.fd)
+            os.close(w)
+            self._thread = threading.Thread(target=self._drain, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        _flush_all()
+        os.dup2(self._saved, self.fd)  # closes the last write end of the pipe
+        os.close(self._saved)
+        if self._thread is not None:
+            self._thread.join()
+            os.close(self._pipe)
+        os.close(self._file)
+
+    def _drain(self):
+        while True:
+            buf = os.read(self._pipe, self.chunk)
+            if not buf:
+                return
+            if self._size + len(buf) > self.max_bytes:
+                self._rotate()
+            os.write(self._file, buf)
+            self._size += len(buf)
+
+    def _rotate(self):
+        if self.backups > 0:
+            os.close(self._file)
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+            self._file = os.open(
+                self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644
+            )
+        else:
+            os.ftruncate(self._file, 0)
+            os.lseek(self._file, 0, os.SEEK_SET)
+        self._size = 0
+
+
+@contextmanager
+def std_capture(
+    out_dir, max_bytes: Optional[int] = None, backups: int = 1, append: bool = False
+):
+    """
+    Stream stdout and stderr to `out_dir`/Output_Python.stdout and
+    `out_dir`/Error_Python.stderr
+    """
+    with ExitStack() as stack:
+        for fd, name in ((1, "Output_Python.stdout"), (2, "Error_Python.stderr")):
+            path = os.path.join(str(out_dir), name)
+            capture = StreamCapture(fd, path, max_bytes, backups, append=append)
+            stack.enter_context(capture)
+        yield
+
+
+log = logging.getLogger(__name__)
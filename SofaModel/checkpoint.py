@@ -0,0 +1,166 @@
+import glob
+import logging
+import os
+import pickle
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from SofaModel.hooks import RunHook
+
+# pickled entries of a checkpoint, "controller" being the scene controller of
+# the older ones
+STATES = ("controller", "controllers", "hooks", "stepper")
+
+
+def mechanical_objects(node):
+    for obj in node.objects:
+        if obj.getClassName() == "MechanicalObject":
+            yield obj
+    for child in node.children:
+        yield from mechanical_objects(child)
+
+
+def get_state(root) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Copy of the positions and velocities of every MechanicalObject, by path
+    """
+    return {
+        obj.getPathName(): (
+            np.array(obj.position.value),
+            np.array(obj.velocity.value),
+        )
+        for obj in mechanical_objects(root)
+    }
+
+
+def _walk(node):
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+
+def controllers(root) -> list:
+    """
+    Components of the graph with a `get_state`/`set_state` pair (SOFAControl)
+    """
+    return [
+        obj
+        for node in _walk(root)
+        for obj in node.objects
+        if callable(getattr(obj, "get_state", None))
+        and callable(getattr(obj, "set_state", None))
+    ]
+
+
+def set_state(root, state: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+    for path, (x, v) in state.items():
+        obj = root[path.lstrip("/")]
+        obj.position.value = x
+        obj.velocity.value = v
+
+
+class Checkpointer(RunHook):
+    """
+    Write the simulation state every `every` steps to `directory` and restore the
+    latest one when `resume` is set, keeping the `keep` most recent checkpoints.
+    Along the MechanicalObjects, a checkpoint holds the state of the controllers
+    of the graph, of the adaptive stepper and of `hooks` (see RunHook.STATE).
+    Added after the other hooks, it restores them once they are started
+    """
+
+    def __init__(
+        self,
+        directory,
+        every: Optional[int] = None,
+        keep: int = 2,
+        resume=False,
+        hooks: Iterable[RunHook] = (),
+    ):
+        if keep < 1:
+            raise ValueError(f"keep must be at least 1, got {keep}")
+        self.directory = str(directory)
+        self.every = every
+        self.keep = keep
+        self.resume = resume
+        self.hooks = list(hooks)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def files(self):
+        return sorted(glob.glob(os.path.join(self.directory, "checkpoint_*.npz")))
+
+    def start(self, model):
+        files = self.files()
+        if self.resume and files:
+            model.step = self.restore(model, files[-1])
+            log.info(f"Resumed from file://{files[-1]} at step {model.step}")
+        elif self.resume:
+            log.warning(f"No checkpoint in {self.directory}, starting from t=0")
+
+    def after_step(self, model):
+        if self.every and model.step % self.every == 0:
+            self.save(model)
+
+    def save(self, model):
+        state = get_state(model.root)
+        arrays = {
+            "step": np.array(model.step),
+            "time": np.array(model.root.time.value),
+            "paths": np.array(list(state)),
+        }
+        for i, (x, v) in enumerate(state.values()):
+            arrays[f"x{i}"], arrays[f"v{i}"] = x, v
+
+        hooks = {k: h.get_state() for k, h in self._hooks().items()}
+        states = {
+            "controllers": {
+                c.getPathName(): c.get_state() for c in controllers(model.root)
+            },
+            "hooks": {k: s for k, s in hooks.items() if s is not None},
+        }
+        if model.stepper is not None:
+            states["stepper"] = model.stepper.get_state()
+        for k, v in states.items():
+            blob = pickle.dumps(v, pickle.HIGHEST_PROTOCOL)
+            arrays[k] = np.frombuffer(blob, dtype=np.uint8)
+
+        path = os.path.join(self.directory, f"checkpoint_{model.step:09d}.npz")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+        files = self.files()
+        for old in files[: max(0, len(files) - self.keep)]:
+            os.remove(old)
+
+    def _hooks(self) -> Dict[str, RunHook]:
+        return {f"{i}_{type(h).__name__}": h for i, h in enumerate(self.hooks)}
+
+    def restore(self, model, path) -> int:
+        with np.load(path) as ck:
+            state = {
+                str(p): (ck[f"x{i}"], ck[f"v{i}"]) for i, p in enumerate(ck["paths"])
+            }
+            set_state(model.root, state)
+            model.root.time.value = float(ck["time"])
+            blobs = {k: pickle.loads(ck[k].tobytes()) for k in ck.files if k in STATES}
+            step = int(ck["step"])
+
+        controller = model.scene.controller
+        if controller is not None and "controller" in blobs:  # older checkpoints
+            controller.set_state(blobs["controller"])
+        for path, ctrl_state in blobs.get("controllers", {}).items():
+            model.root[path.lstrip("/")].set_state(ctrl_state)
+        hooks = self._hooks()
+        for k, hook_state in blobs.get("hooks", {}).items():
+            if k in hooks:
+                hooks[k].set_state(hook_state)
+        if model.stepper is not None and "stepper" in blobs:
+            model.stepper.set_state(blobs["stepper"])
+        return step
+
+
+log = logging.getLogger(__name__)
@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 load_dotenv(tf.f(__file__) / ".env")
 
 from SofaModel import BaseScene, BaseModel
+from SofaModel.cache import InputCache
 
 
 class Scene(BaseScene):
@@ -35,7 +36,13 @@ class Model(BaseModel):
     def set_data_path(self):
         self.params.add("mesh_out", self.out / "mesh.vtk")
         if not tf.isfile(self.params.mesh_out.value):
-            Mesh.Sphere().write(self.params.mesh_out.value)
+            cache = InputCache()
+            cache.fetch(
+                cache.key("Mesh.Sphere"),
+                "mesh.vtk",
+                lambda path: Mesh.Sphere().write(path),
+                self.params.mesh_out.value,
+            )
 
 
 class Params(tf.Params):
@@ -0,0 +1,264 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import signal
+import threading
+import weakref
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+_writers = weakref.WeakSet()
+_previous_sigterm = None
+
+
+def _close_all():
+    for w in list(_writers):
+        w.close(raise_errors=False)
+
+
+atexit.register(_close_all)
+
+
+def _on_sigterm(signum, frame):
+    _close_all()
+    if callable(_previous_sigterm):
+        _previous_sigterm(signum, frame)
+    else:
+        raise SystemExit(128 + signum)
+
+
+def install_sigterm():
+    """
+    Flush the pending exports on SIGTERM then chain to the previous handler (or
+    exit), for callers that do not handle the signal themselves. Must be called
+    from the main thread
+    """
+    global _previous_sigterm
+    current = signal.getsignal(signal.SIGTERM)
+    if current is not _on_sigterm:
+        _previous_sigterm = current
+        signal.signal(signal.SIGTERM, _on_sigterm)
+
+
+def write_npz(
+    directory: str,
+    step: int,
+    time: float,
+    arrays: Dict[str, np.ndarray],
+    compress: bool = False,
+):
+    path = os.path.join(directory, f"export_{step:08d}.npz")
+    with open(f"{path}.tmp", "wb") as f:
+        (np.savez_compressed if compress else np.savez)(f, time=time, **arrays)
+    os.replace(f"{path}.tmp", path)
+
+
+class ExportWriter:
+    """
+    Serialize and write snapshots from a background thread. `submit` copies the
+    arrays and blocks while `max_queue` snapshots are waiting, so a slow disk
+    slows the simulation down instead of filling the memory. The thread starts
+    with the first snapshot, so writers of scenes that are only built (plugin
+    or spec dry runs) cost nothing. Pending snapshots are flushed by `close`
+    (see BaseModel.simulate) and at exit, and on SIGTERM after
+    `install_sigterm()`.
+    """
+
+    def __init__(
+        self,
+        directory,
+        max_queue: int = 8,
+        write: Optional[Callable[[str, int, float, dict], None]] = None,
+    ):
+        self.directory = str(directory)
+        self.write = write or write_npz
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread: Optional[threading.Thread] = None
+        _writers.add(self)
+
+    def submit(self, step: int, time: float, **arrays):
+        if self.closed:
+            raise RuntimeError("ExportWriter is closed")
+        self._raise()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._work, daemon=True)
+            self.thread.start()
+        snapshot = {k: np.array(v, copy=True) for k, v in arrays.items()}
+        self.queue.put((step, time, snapshot))
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                try:
+                    self.write(self.directory, *item)
+                except BaseException as e:
+                    self.error = e
+                    log.error(f"Export of step {item[0]} failed: {e!r}")
+
+    def _raise(self):
+        if self.error is not None:
+            raise RuntimeError("Background export failed") from self.error
+
+    def close(self, raise_errors: bool = True):
+        if not self.closed:
+            self.closed = True
+            if self.thread is not None:
+                self.queue.put(None)
+                self.thread.join()
+        if raise_errors:
+            self._raise()
+
+
+class FieldExport:
+    """
+    One exported Data
+    """
+
+    def __init__(
+        self,
+        path: str,
+        data: str,
+        every: int = 1,
+        zone: Optional[str] = None,
+        dtype: Optional[str] = None,
+        quantize: Optional[float] = None,
+        qdtype: str = "int32",
+    ):
+        """
+        :param every: decimation, exported every `every` steps
+        :param zone: restrict a per-node field to the nodes of a loader zone
+        :param dtype: stored dtype, e.g. "float32"
+        :param quantize: store round(value / quantize) as `qdtype` integers
+        """
+        self.path = path
+        self.data = data
+        self.every = max(1, every)
+        self.zone = zone
+        self.dtype = dtype
+        self.quantize = quantize
+        self.qdtype = qdtype
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    def encode(self, value, nodes: Optional[np.ndarray] = None) -> np.ndarray:
+        x = np.asarray(value)
+        if nodes is not None:
+            x = x[nodes]
+        if self.quantize:
+            info = np.iinfo(self.qdtype)
+            q = np.rint(np.asarray(x, dtype=float) / self.quantize)
+            return np.clip(q, info.min, info.max).astype(self.qdtype)
+        return x.astype(self.dtype, copy=False) if self.dtype else x
+
+    def decode(self, stored: np.ndarray) -> np.ndarray:
+        if self.quantize:
+            return stored.astype(float) * self.quantize
+        return stored
+
+
+class ExportConfig:
+    """
+    Fields to export and how, see FieldExport. Zones are looked up by name in
+    the pointZoneNames/pointZones then surfaceZoneNames/surfaceZones Data of
+    `loader`:
+        ExportConfig(
+            fields={
+                "endoL": FieldExport("MecaNode/mecaObj", "position", every=10,
+                                     zone="LV_endo", dtype="float32"),
+                "pressureL": FieldExport("MecaNode/pressureforceL", "pressure"),
+            },
+            loader="MecaNode/loader",
+        )
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, FieldExport],
+        loader: Optional[str] = None,
+    ):
+        self.fields = fields
+        self.loader = loader
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ExportConfig":
+        fields = {
+            k: v if isinstance(v, FieldExport) else FieldExport(**v)
+            for k, v in d.get("fields", {}).items()
+        }
+        return cls(fields, d.get("loader"))
+
+    @classmethod
+    def load(cls, path) -> "ExportConfig":
+        with open(str(path)) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> dict:
+        return {
+            "fields": {k: f.to_dict() for k, f in self.fields.items()},
+            "loader": self.loader,
+        }
+
+    def zones(self):
+        return sorted({f.zone for f in self.fields.values() if f.zone})
+
+    def due(self, step: int) -> Dict[str, FieldExport]:
+        return {k: f for k, f in self.fields.items() if step % f.every == 0}
+
+
+def _names(value) -> list:
+    if isinstance(value, str):
+        return value.split()
+    return [str(x) for x in value]
+
+
+def zone_nodes(
+    zone: str, point_zones: Tuple = (None, None), surface_zones: Tuple = (None, None)
+) -> np.ndarray:
+    """
+    Node indices of `zone` given the (names, zones) Data values of a loader,
+    surface zones being lists of triangles
+    """
+    for names, zones in (point_zones, surface_zones):
+        if names is None or zones is None:
+            continue
+        names = _names(names)
+        if zone in names:
+            idx = np.asarray(zones[names.index(zone)], dtype=np.int64)
+            return np.unique(idx.ravel())
+    raise KeyError(f"No point or surface zone named {zone!r}")
+
+
+def read_exports(directory) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    (times, values) per field of the exports of a ConfiguredExporter, values
+    decoded to float when quantized. Zone fields hold the nodes of
+    zones.npz[zone] only
+    """
+    from SofaModel.store import ResultStore
+
+    directory = str(directory)
+    with open(os.path.join(directory, "export_config.json")) as f:
+        config = ExportConfig.from_dict(json.load(f))
+    series = {k: (np.zeros(0), np.zeros(0)) for k in config.fields}
+    for every in sorted({f.every for f in config.fields.values()}):
+        path = os.path.join(directory, f"rate_{every}.bin")
+        if not os.path.exists(path):
+            continue
+        with ResultStore.open(path) as store:
+            t = np.array(store["time"])
+            for k in store.fields:
+                if k in series:
+                    series[k] = (t, config.fields[k].decode(np.array(store[k])))
+    return series
+
+log = logging.getLogger(__name__)
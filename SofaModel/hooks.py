@@ -0,0 +1,28 @@
+class RunHook:
+    """
+    Callbacks around the batch loop of `BaseModel.run`, `model.step` holds the
+    number of completed iterations. The attributes named in `STATE` are saved
+    in the checkpoints and restored on resume
+    """
+
+    STATE = ()
+
+    def get_state(self):
+        if self.STATE:
+            return {k: getattr(self, k) for k in self.STATE}
+
+    def set_state(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    def start(self, model):
+        pass
+
+    def before_step(self, model):
+        pass
+
+    def after_step(self, model):
+        pass
+
+    def finish(self, model):
+        pass
@@ -0,0 +1,251 @@
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional
+
+from SofaModel.sweep import run_one
+
+STATES = ("pending", "running", "done", "failed")
+
+
+class JobQueue:
+    """
+    Queue of run jobs (see `sweep.run_one`) living in a directory of a file
+    system shared by the nodes, one json file per job in pending/, running/,
+    done/ or failed/. A worker claims a job by renaming it from pending/ to
+    running/ (atomic, only one worker wins), touching it first so that its age
+    restarts at the claim, then every `heartbeat` seconds. Jobs of dead workers,
+    whose heartbeat is older than `timeout`, are moved back to pending/ by any
+    worker, up to `max_attempts` times.
+    """
+
+    def __init__(
+        self,
+        root,
+        heartbeat: float = 30,
+        timeout: float = 300,
+        max_attempts: int = 3,
+    ):
+        self.root = str(root)
+        self.heartbeat = heartbeat
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        for d in (*STATES, "tmp"):
+            os.makedirs(os.path.join(self.root, d), exist_ok=True)
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    def path(self, state: str, job_id: str) -> str:
+        return os.path.join(self.root, state, f"{job_id}.json")
+
+    def _write(self, path, obj):
+        tmp = os.path.join(self.root, "tmp", f"{uuid.uuid4().hex}.json")
+        with open(tmp, "w") as f:
+            json.dump(obj, f, indent=2, default=str)
+        os.replace(tmp, path)
+
+    def _read(self, path) -> Optional[dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+    def _now(self) -> float:
+        # file server clock, the heartbeats are stamped by it too
+        clock = os.path.join(self.root, "tmp", "clock")
+        with open(clock, "a"):
+            os.utime(clock)
+        return os.path.getmtime(clock)
+
+    def submit(self, jobs: Iterable[dict]) -> List[str]:
+        ids = []
+        for job in jobs:
+            job_id = job.get("id") or f"{job['name']}-{uuid.uuid4().hex[:8]}"
+            self._write(
+                self.path("pending", job_id),
+                {"id": job_id, "attempts": 0, "submitted": time.time(), "job": job},
+            )
+            ids.append(job_id)
+        return ids
+
+    def ids(self, state: str) -> List[str]:
+        d = os.path.join(self.root, state)
+        return sorted(f[: -len(".json")] for f in os.listdir(d) if f.endswith(".json"))
+
+    def claim(self) -> Optional[dict]:
+        for job_id in self.ids("pending"):
+            pending = self.path("pending", job_id)
+            running = self.path("running", job_id)
+            try:
+                # the rename keeps the mtime of the submission, which would look
+                # stale to requeue_stale before the record below is written
+                os.utime(pending)
+                os.rename(pending, running)
+            except FileNotFoundError:  # claimed by another worker
+                continue
+            record = self._read(running)
+            if record is None:
+                continue
+            record.update(
+                worker=self.worker,
+                host=socket.gethostname(),
+                started=time.time(),
+                attempts=record["attempts"] + 1,
+            )
+            self._write(running, record)
+            return record
+
+    def requeue_stale(self):
+        now = self._now()
+        for job_id in self.ids("running"):
+            running = self.path("running", job_id)
+            try:
+                age = now - os.path.getmtime(running)
+            except FileNotFoundError:
+                continue
+            if age < self.timeout:
+                continue
+            record = self._read(running)
+            if record is None:
+                continue
+            state = "pending" if record["attempts"] < self.max_attempts else "failed"
+            try:
+                os.rename(running, self.path(state, job_id))
+            except FileNotFoundError:  # finished or requeued meanwhile
+                continue
+            log.warning(
+                f"Job {job_id} of {record.get('worker')} silent for {age:.0f}s, "
+                f"moved to {state}"
+            )
+
+    def _beat(self, path, stop: threading.Event):
+        while not stop.wait(self.heartbeat):
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return
+
+    def execute(self, record: dict):
+        job_id = record["id"]
+        running = self.path("running", job_id)
+        stop = threading.Event()
+        beat = threading.Thread(target=self._beat, args=(running, stop), daemon=True)
+        beat.start()
+        try:
+            row = run_one(record["job"])
+        finally:
+            stop.set()
+            beat.join()
+
+        record.update(result=row, wall=row["wall"], finished=time.time())
+        state = "failed" if row["status"] == "failed" else "done"
+        self._write(self.path(state, job_id), record)
+        current = self._read(running)
+        if current is not None and current.get("worker") == self.worker:
+            os.remove(running)
+        log.info(f"Job {job_id}: {row['status']} in {row['wall']:.1f}s")
+
+    def work(self, max_jobs: Optional[int] = None, idle_exit=True, poll: float = 5):
+        """
+        Claim and run jobs until the queue is drained (or forever without
+        `idle_exit`)
+        """
+        done = 0
+        while max_jobs is None or done < max_jobs:
+            self.requeue_stale()
+            record = self.claim()
+            if record is None:
+                if idle_exit and not self.ids("pending") and not self.ids("running"):
+                    return done
+                time.sleep(poll)
+                continue
+            self.execute(record)
+            done += 1
+        return done
+
+    def status(self) -> List[dict]:
+        rows = []
+        for state in STATES:
+            for job_id in self.ids(state):
+                r = self._read(self.path(state, job_id)) or {}
+                rows.append(
+                    {
+                        "id": job_id,
+                        "state": state,
+                        "host": r.get("host", ""),
+                        "attempts": r.get("attempts", 0),
+                        "wall": r.get("wall"),
+                    }
+                )
+        return rows
+
+    def table(self) -> str:
+        rows = self.status()
+        lines = [f"{'id':<40} {'state':<8} {'host':<20} {'tries':>5} {'wall (s)':>9}"]
+        for r in rows:
+            wall = "" if r["wall"] is None else f"{r['wall']:.1f}"
+            lines.append(
+                f"{r['id'][:40]:<40} {r['state']:<8} {r['host'][:20]:<20} "
+                f"{r['attempts']:>5} {wall:>9}"
+            )
+        counts = ", ".join(
+            f"{s}: {sum(r['state'] == s for r in rows)}" for s in STATES
+        )
+        return "\n".join([*lines, counts])
+
+
+def _worker(root, kwargs):
+    logging.basicConfig(level=logging.INFO)
+    JobQueue(root).work(**kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared file system job queue")
+    parser.add_argument("root", help="Queue directory")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    work = sub.add_parser("work", help="Run jobs until the queue is drained")
+    work.add_argument("-j", "--workers", type=int, default=1)
+    work.add_argument("--forever", action="store_true", help="Wait for new jobs")
+    sub.add_parser("status", help="Print the state of every job")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "status":
+        print(JobQueue(args.root).table())
+        return 0
+
+    kwargs = {"idle_exit": not args.forever}
+    ctx = mp.get_context("spawn")
+
+    def spawn():
+        p = ctx.Process(target=_worker, args=(args.root, kwargs))
+        p.start()
+        return p
+
+    # a worker killed by its run (e.g. a segfault of SOFA) is replaced, its job
+    # goes back to pending/ once its heartbeat is stale
+    procs = [spawn() for _ in range(args.workers)]
+    while procs:
+        for i, p in enumerate(procs):
+            p.join(1)
+            if p.exitcode is None:
+                continue
+            if p.exitcode != 0:
+                log.warning(f"Worker {p.pid} died ({p.exitcode}), respawning")
+                procs[i] = spawn()
+            else:
+                procs[i] = None
+        procs = [p for p in procs if p is not None]
+    return 0
+
+
+log = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -1,15 +1,22 @@
 import logging
 
 
+_loaded = False
+
+
 def load_SOFA():
+    global _loaded
     import os
     import sys
 
+    if _loaded:
+        return
+
     sofa_build = os.environ.get("SOFA_ROOT")
     if not sofa_build:
         log.error(
             "The env variable `SOFA_ROOT` is required\n"
-            "from: 'Model3D/basesofamodel/load_SOFA.py'"
+            "from: 'SofaModel/load_SOFA.py'"
         )
         raise SystemExit
     if not os.path.isdir(sofa_build):
@@ -24,6 +31,7 @@ def load_SOFA():
     )
     os.environ["SOFA_ROOT"] = sofa_build
     os.environ["SOFAPYTHON3_ROOT"] = sofa_build
+    _loaded = True
 
     log.info(f"--> Found SOFA: {sofa_build!r}")
 
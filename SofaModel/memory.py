@@ -0,0 +1,156 @@
+import csv
+import json
+import logging
+import os
+import resource
+import tracemalloc
+from typing import List, Optional
+
+import numpy as np
+
+from SofaModel.hooks import RunHook
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+MB = 1 << 20
+
+
+def rss() -> int:
+    """
+    Current resident set size of the process in bytes
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, IndexError, ValueError):
+        return peak_rss()  # no procfs, best effort
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size of the process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class MemoryMonitor(RunHook):
+    """
+    Sample the process RSS (SOFA components included) and the memory allocated by
+    Python (tracemalloc, controllers and exported arrays) every `every` steps.
+    Writes to `directory`:
+        memory.csv: step, time, rss and python memory in MB
+        memory_summary.json: peaks, growth per step and top python allocations
+
+    Once `warmup` steps are done, the RSS growth per step is fitted over the
+    samples and a warning is logged (once) when it exceeds `leak_bytes`, along
+    with the memory projected at the end of the run.
+    """
+
+    def __init__(
+        self,
+        directory,
+        every: int = 10,
+        trace: bool = True,
+        warmup: int = 10,
+        leak_bytes: int = 64 << 10,
+        top: int = 10,
+    ):
+        self.directory = str(directory)
+        self.every = max(1, every)
+        self.trace = trace
+        self.warmup = warmup
+        self.leak_bytes = leak_bytes
+        self.top = top
+        self.rows: List[tuple] = []
+        self.warned = False
+        self._started_trace = False
+
+    def start(self, model):
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_trace = True
+        self.rows = []
+        self.warned = False
+        self.sample(model)
+
+    def sample(self, model):
+        py, py_peak = tracemalloc.get_traced_memory() if self.trace else (0, 0)
+        self.rows.append((model.step, model.root.time.value, rss(), py, py_peak))
+
+    def growth(self) -> Optional[float]:
+        """
+        RSS growth in bytes per step fitted over the samples after the warmup
+        """
+        rows = [r for r in self.rows if r[0] >= self.warmup]
+        if len(rows) < 5:  # the fit is dominated by allocator noise below
+            return None
+        steps, mem = np.array([(r[0], r[2]) for r in rows], dtype=float).T
+        return float(np.polyfit(steps, mem, 1)[0])
+
+    def after_step(self, model):
+        if model.step % self.every:
+            return
+        self.sample(model)
+
+        slope = self.growth()
+        if not self.warned and slope is not None and slope > self.leak_bytes:
+            self.warned = True
+            msg = (
+                f"Memory grows by {slope / 1024:.0f} KiB/step since step "
+                f"{self.warmup} (rss {self.rows[-1][2] / MB:.0f} MB at step "
+                f"{model.step}), possible leak"
+            )
+            if model.stepper is None:  # otherwise the number of steps is unknown
+                remaining = max(0, model.params.n.value - model.step)
+                projected = self.rows[-1][2] + slope * remaining
+                msg += f", projected {projected / MB:.0f} MB at the end"
+            log.warning(msg)
+
+    def finish(self, model):
+        if not self.rows:  # the scene failed to initialise
+            return
+        if self.rows[-1][0] != model.step:
+            self.sample(model)
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(os.path.join(self.directory, "memory.csv"), "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["step", "time", "rss_mb", "python_mb"])
+            for step, t, r, py, _ in self.rows:
+                w.writerow([step, f"{t:.9g}", f"{r / MB:.3f}", f"{py / MB:.3f}"])
+
+        top = []
+        if self.trace and tracemalloc.is_tracing():
+            stats = tracemalloc.take_snapshot().statistics("lineno")
+            top = [
+                {"where": str(s.traceback), "mb": s.size / MB, "count": s.count}
+                for s in stats[: self.top]
+            ]
+        slope = self.growth()
+        peak = max(self.rows, key=lambda r: r[2])
+        summary = {
+            "every": self.every,
+            "samples": len(self.rows),
+            "peak_rss_mb": peak_rss() / MB,
+            "peak_sampled_rss_mb": peak[2] / MB,
+            "peak_sampled_step": peak[0],
+            "start_rss_mb": self.rows[0][2] / MB,
+            "end_rss_mb": self.rows[-1][2] / MB,
+            "peak_python_mb": max(r[4] for r in self.rows) / MB,
+            "growth_kb_per_step": None if slope is None else slope / 1024,
+            "leak_suspected": self.warned,
+            "top_python": top,
+        }
+        with open(os.path.join(self.directory, "memory_summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+        if self._started_trace:
+            tracemalloc.stop()
+            self._started_trace = False
+        log.info(
+            f"Memory: peak rss {summary['peak_rss_mb']:.0f} MB, "
+            f"python peak {summary['peak_python_mb']:.1f} MB"
+        )
+
+
+log = logging.getLogger(__name__)
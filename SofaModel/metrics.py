@@ -0,0 +1,252 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from SofaModel.hooks import RunHook
+from SofaModel.memory import rss
+
+STATUS_FILE = "metrics.json"
+
+
+def linear_solvers(root) -> list:
+    """
+    Linear solvers of the scene, their `graph` Data holds the residuals of the
+    last solve (one entry per CG iteration)
+    """
+    found, todo = [], [root]
+    while todo:
+        node = todo.pop()
+        todo.extend(node.children)
+        for obj in node.objects:
+            if obj.getClassName().endswith("LinearSolver"):
+                found.append(obj)
+    return found
+
+
+def solver_iterations(solver) -> Optional[int]:
+    graph = solver.findData("graph")
+    if graph is None or not isinstance(graph.value, dict):
+        return None
+    errors = [v for k, v in graph.value.items() if k.endswith("Error")]
+    return max(map(len, errors)) if errors else None
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class RunMetrics(RunHook):
+    """
+    Publish the progress of a batch run, refreshed at most every `interval`
+    seconds so the loop only pays for a clock read on the other steps:
+        out_dir/metrics.json, rewritten atomically
+        http://host:port/metrics in Prometheus text format when `port` is set,
+        served from a thread (port=0 picks a free port, saved in metrics.json),
+        on the loopback interface unless `host` is set, e.g. "0.0.0.0" to let
+        a scraper on another machine read it
+    """
+
+    def __init__(
+        self,
+        directory,
+        interval: float = 5.0,
+        port: Optional[int] = None,
+        host: str = "127.0.0.1",
+    ):
+        self.path = os.path.join(str(directory), STATUS_FILE)
+        self.interval = interval
+        self.port = port
+        self.host = host
+        self.snapshot: Dict = {}
+        self.solvers = []
+        self._server = None
+        self._started = None
+        self._next = 0.0
+        self._last = None  # (wall time, step, simulated time) of the last refresh
+        self._rate = None
+        self._sim_rate = None
+
+    def start(self, model):
+        self.solvers = [(s.getPathName(), s) for s in linear_solvers(model.root)]
+        if self.port is not None:
+            self._serve()
+        now = time.time()
+        self._started = now
+        self._last = (now, model.step, model.root.time.value)
+        self.refresh(model, "running")
+
+    def after_step(self, model):
+        now = time.monotonic()
+        if now < self._next:
+            return
+        self._next = now + self.interval
+        self.refresh(model, "running")
+
+    def finish(self, model):
+        if self._last is None:  # start did not run
+            return
+        self.refresh(model, model.stop_reason or "finished")
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def refresh(self, model, state: str):
+        now = time.time()
+        t = model.root.time.value
+        wall, step, sim = self._last
+        if now > wall and model.step > step:
+            # smoothed over the refreshes, the first steps are often slower
+            rate = (model.step - step) / (now - wall)
+            sim_rate = (t - sim) / (now - wall)
+            a = 0.0 if self._rate is None else 0.7
+            self._rate = a * (self._rate or 0) + (1 - a) * rate
+            self._sim_rate = a * (self._sim_rate or 0) + (1 - a) * sim_rate
+            self._last = (now, model.step, t)
+
+        eta = None
+        if self._rate:
+            if model.stepper is not None:
+                if self._sim_rate:
+                    eta = max(0.0, (model.stepper.t_end - t) / self._sim_rate)
+            else:
+                eta = max(0, model.params.n.value - model.step) / self._rate
+
+        self.snapshot = {
+            "out_dir": str(model.params.out_dir.value),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "port": self.port,
+            "state": state,
+            "step": model.step,
+            "steps": None if model.stepper is not None else model.params.n.value,
+            "time": t,
+            "t_end": model.stepper.t_end if model.stepper is not None else None,
+            "steps_per_s": self._rate,
+            "eta_s": eta,
+            "elapsed_s": now - self._started,
+            "solver_iterations": {
+                path: solver_iterations(s) for path, s in self.solvers
+            },
+            "rss_bytes": rss(),
+            "updated": now,
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def prometheus(self) -> str:
+        s = self.snapshot
+        out_dir = _escape(s.get("out_dir", ""))
+        labels = f'out_dir="{out_dir}",pid="{s.get("pid", "")}"'
+        lines = []
+
+        def metric(name, value, doc, extra=""):
+            if value is None:
+                return
+            if not any(x.startswith(f"# HELP {name} ") for x in lines):
+                lines.append(f"# HELP {name} {doc}")
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{{{labels}{extra}}} {value}")
+
+        metric("sofa_step", s.get("step"), "Completed iterations")
+        metric("sofa_steps", s.get("steps"), "Iterations of the run")
+        metric("sofa_time_seconds", s.get("time"), "Simulated time")
+        metric("sofa_steps_per_second", s.get("steps_per_s"), "Iteration rate")
+        metric("sofa_eta_seconds", s.get("eta_s"), "Estimated remaining wall time")
+        metric("sofa_elapsed_seconds", s.get("elapsed_s"), "Wall time of the run")
+        metric("sofa_rss_bytes", s.get("rss_bytes"), "Resident memory")
+        metric("sofa_running", int(s.get("state") == "running"), "1 while running")
+        for path, n in s.get("solver_iterations", {}).items():
+            metric(
+                "sofa_solver_iterations",
+                n,
+                "Iterations of the last linear solve",
+                f',solver="{_escape(path)}"',
+            )
+        return "\n".join(lines) + "\n"
+
+    def _serve(self):
+        hook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = hook.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        log.info(f"Metrics served on http://{self.host}:{self.port}/metrics")
+
+
+def collect(root: str) -> list:
+    """
+    Status of every run below `root` (a sweep or job queue output directory)
+    """
+    rows = []
+    pattern = os.path.join(root, "**", STATUS_FILE)
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        try:
+            with open(path) as f:
+                rows.append(json.load(f))
+        except (OSError, ValueError):  # being replaced
+            continue
+    return rows
+
+
+def table(rows: list) -> str:
+    header = ["out_dir", "state", "step", "time", "steps/s", "eta (s)", "rss (MB)"]
+    fmt_num = lambda x, spec: "" if x is None else format(x, spec)
+    lines = [
+        [
+            r["out_dir"],
+            r["state"],
+            f"{r['step']}" + (f"/{r['steps']}" if r.get("steps") else ""),
+            fmt_num(r.get("time"), ".6g"),
+            fmt_num(r.get("steps_per_s"), ".2f"),
+            fmt_num(r.get("eta_s"), ".0f"),
+            fmt_num(r["rss_bytes"] / 2**20, ".0f"),
+        ]
+        for r in rows
+    ]
+    widths = [max(len(x) for x in col) for col in zip(header, *lines)]
+    fmt = lambda row: "  ".join(x.ljust(w) for x, w in zip(row, widths))
+    sep = "  ".join("-" * w for w in widths)
+    running = sum(r["state"] == "running" for r in rows)
+    footer = f"{running}/{len(rows)} runs running"
+    return "\n".join([fmt(header), sep, *map(fmt, lines), sep, footer])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Progress of the runs in a tree")
+    parser.add_argument("root", help="Directory searched for metrics.json files")
+    args = parser.parse_args(argv)
+    print(table(collect(args.root)))
+    return 0
+
+
+log = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
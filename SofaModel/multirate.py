@@ -0,0 +1,135 @@
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def _walk(node):
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+
+class MultiRate:
+    """
+    Sub-cycle solver subgraphs: each node of `substeps` (path -> k) is advanced
+    in k steps of dt/k for every step of the rest of the graph.
+
+    One model step is:
+        1. the sub-cycled nodes are deactivated and the graph animated over dt
+        2. the other solver nodes are deactivated, the time reset, and the
+           sub-cycled nodes animated k times over dt/k. Before sub-step i, the
+           Data of `interpolate` (node path -> [(path, data)], read by the
+           sub-cycled node from the slow part) are set to the linear
+           interpolation, at the end of the sub-step, of their values before
+           and after 1.
+        3. the interpolated Data are restored and every node reactivated
+    Components outside the sub-cycled nodes (exporters, python controllers)
+    only hear the events of step 1, so they see the sub-cycled nodes at t0 in
+    their end-of-step callbacks
+    """
+
+    def __init__(
+        self,
+        substeps: Dict[str, int],
+        interpolate: Dict[str, List[Tuple[str, str]]] = None,
+    ):
+        self.substeps = {p: int(k) for p, k in substeps.items() if int(k) > 1}
+        self.interpolate = interpolate or {}
+        self.fast = {}
+        self.slow = []
+        self.listeners = []
+        self.handles = {}
+
+    def start(self, model):
+        root = model.root
+        self.fast = {path: root[path] for path in self.substeps}
+        self.handles = {
+            path: [root[p].findData(d) for p, d in self.interpolate.get(path, [])]
+            for path in self.substeps
+        }
+
+        inside = set()
+        for node in self.fast.values():
+            inside.update(id(n) for n in _walk(node))
+        # solver nodes of the slow part, deactivated while sub-cycling. A node
+        # holding a sub-cycled one is left active, its solver runs again
+        self.slow = []
+        if any(o.getClassName().endswith("Solver") for o in root.objects):
+            log.warning("The root solver also runs during the sub-steps")
+        for n in _walk(root):
+            if id(n) in inside or n is root:
+                continue
+            if not any(o.getClassName().endswith("Solver") for o in n.objects):
+                continue
+            if any(id(c) in inside for c in _walk(n)):
+                log.warning(f"{n.getPathName()} holds a sub-cycled node")
+                continue
+            self.slow.append(n)
+        self.listeners = []
+        for node in _walk(root):
+            if id(node) in inside:
+                continue
+            for obj in node.objects:
+                d = obj.findData("listening")
+                if d is not None and d.value:
+                    self.listeners.append(d)
+        log.info(
+            "Sub-cycling "
+            + ", ".join(f"{p} x{k}" for p, k in self.substeps.items())
+            + f" against {len(self.slow)} solver nodes"
+        )
+
+    @staticmethod
+    def _activate(nodes, value: bool):
+        for node in nodes:
+            node.findData("activated").value = value
+
+    def animate(self, model, dt: float):
+        from Sofa import Simulation
+
+        root = model.root
+        if not self.substeps:
+            Simulation.animate(root, dt)
+            return
+
+        t0 = root.time.value
+        before = {
+            p: [np.array(h.value) for h in hs] for p, hs in self.handles.items()
+        }
+        self._activate(self.fast.values(), False)
+        try:
+            Simulation.animate(root, dt)
+        finally:
+            self._activate(self.fast.values(), True)
+        after = {
+            p: [np.array(h.value) for h in hs] for p, hs in self.handles.items()
+        }
+
+        self._activate(self.slow, False)
+        listening = [d.value for d in self.listeners]  # restored as found
+        for d in self.listeners:
+            d.value = False
+        try:
+            for path, k in self.substeps.items():
+                others = [n for p, n in self.fast.items() if p != path]
+                self._activate(others, False)
+                handles = self.handles[path]
+                for i in range(k):
+                    w = (i + 1) / k  # implicit sub-step, end of interval values
+                    for h, x0, x1 in zip(handles, before[path], after[path]):
+                        h.value = (1 - w) * x0 + w * x1
+                    root.time.value = t0 + i * dt / k
+                    Simulation.animate(root, dt / k)
+                self._activate(others, True)
+        finally:
+            for path, handles in self.handles.items():
+                for h, x1 in zip(handles, after[path]):
+                    h.value = x1
+            for d, value in zip(self.listeners, listening):
+                d.value = value
+            self._activate(self.slow, True)
+            root.time.value = t0 + dt
+
+
+log = logging.getLogger(__name__)
@@ -0,0 +1,150 @@
+import logging
+from typing import Iterator, Set
+
+# Plugin (SOFA >= 22.06 module name) providing each component type
+COMPONENT_PLUGINS = {
+    "MeshVTKLoader": "Sofa.Component.IO.Mesh",
+    "MeshObjLoader": "Sofa.Component.IO.Mesh",
+    "VTKExporter": "Sofa.Component.IO.Mesh",
+    "EulerImplicitSolver": "Sofa.Component.ODESolver.Backward",
+    "StaticSolver": "Sofa.Component.ODESolver.Backward",
+    "EulerExplicitSolver": "Sofa.Component.ODESolver.Forward",
+    "CGLinearSolver": "Sofa.Component.LinearSolver.Iterative",
+    "ShewchukPCGLinearSolver": "Sofa.Component.LinearSolver.Iterative",
+    "JacobiPreconditioner": "Sofa.Component.LinearSolver.Preconditioner",
+    "SSORPreconditioner": "Sofa.Component.LinearSolver.Preconditioner",
+    "SparseLDLSolver": "Sofa.Component.LinearSolver.Direct",
+    "SparseCholeskySolver": "Sofa.Component.LinearSolver.Direct",
+    "MechanicalObject": "Sofa.Component.StateContainer",
+    "TetrahedronSetTopologyContainer": "Sofa.Component.Topology.Container.Dynamic",
+    "TetrahedronSetTopologyModifier": "Sofa.Component.Topology.Container.Dynamic",
+    "TetrahedronSetGeometryAlgorithms": "Sofa.Component.Topology.Container.Dynamic",
+    "TriangleSetTopologyContainer": "Sofa.Component.Topology.Container.Dynamic",
+    "TetrahedronFEMForceField": "Sofa.Component.SolidMechanics.FEM.Elastic",
+    "FixedConstraint": "Sofa.Component.Constraint.Projective",
+    "IdentityMapping": "Sofa.Component.Mapping.Linear",
+    "BarycentricMapping": "Sofa.Component.Mapping.Linear",
+    "DiagonalMass": "Sofa.Component.Mass",
+    "UniformMass": "Sofa.Component.Mass",
+    "MeshMatrixMass": "Sofa.Component.Mass",
+    "Gravity": "Sofa.Component.MechanicalLoad",
+    "VisualStyle": "Sofa.Component.Visual",
+    "VisualModel": "Sofa.GL.Component.Rendering3D",
+    "OglModel": "Sofa.GL.Component.Rendering3D",
+    "ParallelTetrahedronFEMForceField": "MultiThreading",
+    "ParallelHexahedronFEMForceField": "MultiThreading",
+    "ParallelSpringForceField": "MultiThreading",
+    "ParallelMeshSpringForceField": "MultiThreading",
+    "ParallelStiffSpringForceField": "MultiThreading",
+    "ParallelBVHNarrowPhase": "MultiThreading",
+    "ParallelBruteForceBroadPhase": "MultiThreading",
+    "CardiacVTKLoader": "CardiacMeshTools",
+    "CostaForceField": "MechanicalHeart",
+    "ContractionForceField": "MechanicalHeart",
+    "ContractionCouplingForceField": "MechanicalHeart",
+    "ContractionInitialization": "MechanicalHeart",
+    "BaseConstraintForceField": "MechanicalHeart",
+    "PressureConstraintForceField": "MechanicalHeart",
+    "ProjectivePressureConstraint": "MechanicalHeart",
+    "CardiacSimulationExporter": "MechanicalHeart",
+}
+
+
+class _Data:
+    def __init__(self, value=None):
+        self.value = value
+
+
+class RecordedObject:
+    def __init__(self, type_name, kwargs):
+        self.type = type_name
+        self.kwargs = kwargs
+        self._data = {k: _Data(v) for k, v in kwargs.items()}
+
+    def findData(self, name):
+        return self._data.setdefault(name, _Data())
+
+    def getClassName(self):
+        return self.type
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.findData(name)
+
+
+class RecordingNode:
+    """
+    Stand-in for Sofa.Core.Node which records the components a scene adds,
+    used to run `BaseScene.init` without SOFA
+    """
+
+    def __init__(self, name: str = "root", parent=None):
+        self.name = name
+        self.parent = parent
+        self.objects = []
+        self.children = []
+        self._data = {}
+
+    def addObject(self, type_name, **kwargs):
+        if not isinstance(type_name, str):  # python controller instance
+            return type_name
+        obj = RecordedObject(type_name, kwargs)
+        self.objects.append(obj)
+        return obj
+
+    def addChild(self, name):
+        child = RecordingNode(name, self)
+        self.children.append(child)
+        return child
+
+    def findData(self, name):
+        return self._data.setdefault(name, _Data())
+
+    def __getitem__(self, path):
+        node = self
+        for part in path.split("/"):
+            if part == "..":
+                node = node.parent
+                continue
+            match = [c for c in node.children if c.name == part]
+            match += [o for o in node.objects if o.kwargs.get("name") == part]
+            if not match:
+                raise KeyError(path)
+            node = match[0]
+        return node
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.findData(name)
+
+    def walk(self) -> Iterator[RecordedObject]:
+        yield from self.objects
+        for c in self.children:
+            yield from c.walk()
+
+
+def scene_plugins(scene, params) -> Set[str]:
+    """
+    Dry-run `scene.init` on a RecordingNode and return the plugins providing the
+    components it adds, RequiredPlugin entries included
+    """
+    root = RecordingNode()
+    scene.real_init(root, params)
+    scene.init()
+
+    plugins = set()
+    for obj in root.walk():
+        if obj.type == "RequiredPlugin":
+            plugins.update(
+                str(obj.kwargs.get("pluginName", obj.kwargs.get("name"))).split()
+            )
+        elif obj.type in COMPONENT_PLUGINS:
+            plugins.add(COMPONENT_PLUGINS[obj.type])
+        else:
+            log.debug(f"No known plugin for component {obj.type!r}")
+    return plugins
+
+
+log = logging.getLogger(__name__)
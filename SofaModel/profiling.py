@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+from SofaModel.hooks import RunHook
+
+TIMER = "Animate"  # AdvancedTimer id used by Simulation.animate
+
+
+class Profiler(RunHook):
+    """
+    Enable the SOFA AdvancedTimer every `every` steps and aggregate its records
+    per component/step label. A step is timed around `model.animate` only, so
+    the other hooks (checkpoints, exports, features) are not counted in it. The
+    records are read after each Simulation.animate call, so the retries of the
+    adaptive stepper and the multirate sub-steps are all counted.
+    Step wall times are kept as running aggregates plus at most `samples` of
+    the timed steps, the trace holds the first `samples` timed steps.
+    Writes to `directory`:
+        profile_trace.json: Chrome trace (chrome://tracing, ui.perfetto.dev)
+        profile_summary.json: per label totals and step wall time statistics
+        profile_top.txt: the `top` most expensive labels
+    """
+
+    def __init__(self, directory, every: int = 1, top: int = 20, samples: int = 1000):
+        self.directory = str(directory)
+        self.every = max(1, every)
+        self.top = top
+        self.samples = samples
+        self.events = []
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.n_steps = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+        self.step_ms = {}  # step -> wall time (ms) of the first `samples` timed
+        self.n_sampled = 0
+        self.sampled_ms = 0.0
+        self._origin = None
+        self._t0 = None
+        self._dur = 0.0
+        self._sampled = False
+        self._step = 0
+        self._animate = None
+
+    def start(self, model):
+        from Sofa import Simulation, Timer
+
+        Timer.setOutputType(TIMER, "ljson")  # keep the records off stdout
+        Timer.setInterval(TIMER, 1)
+        self._origin = time.perf_counter()
+
+        animate = model.animate
+
+        def timed(dt):
+            t = time.perf_counter()
+            if self._t0 is None:
+                self._t0 = t
+            try:
+                animate(dt)
+            finally:
+                self._dur += time.perf_counter() - t
+
+        model.animate = timed
+
+        self._animate = sim_animate = Simulation.animate
+
+        def recorded(root, dt):
+            t = time.perf_counter()
+            sim_animate(root, dt)
+            if self._sampled and self._trace:
+                ts = (t - self._origin) * 1e6
+                self._walk(Timer.getRecords(TIMER) or {}, ts, self._step)
+
+        Simulation.animate = recorded
+
+    @property
+    def _trace(self) -> bool:
+        return self.n_sampled < self.samples
+
+    def before_step(self, model):
+        from Sofa import Timer
+
+        self._sampled = model.step % self.every == 0
+        self._step = model.step
+        Timer.setEnabled(TIMER, self._sampled)
+        self._t0 = None
+        self._dur = 0.0
+
+    def after_step(self, model):
+        if self._t0 is None:  # nothing animated
+            return
+        ms = self._dur * 1e3
+        self.n_steps += 1
+        self.total_ms += ms
+        self.min_ms = min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+        if not self._sampled:
+            return
+
+        self.sampled_ms += ms
+        if self._trace:
+            self.step_ms[model.step] = ms
+            ts = (self._t0 - self._origin) * 1e6
+            self.events.append(self._event("step", ts, ms * 1e3, model.step, "python"))
+        self.n_sampled += 1
+
+    def _event(self, name, ts, dur, step, cat="sofa"):
+        return {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": ts,
+            "dur": dur,
+            "pid": os.getpid(),
+            "tid": 0,
+            "args": {"step": step},
+        }
+
+    def _walk(self, records: dict, ts: float, step: int):
+        for label, rec in records.items():
+            if not isinstance(rec, dict):
+                continue
+            total = rec.get("total_time")
+            if isinstance(total, (int, float)):
+                self.totals[label] += total
+                self.counts[label] += 1
+                start = rec.get("start_time", 0.0)
+                self.events.append(
+                    self._event(label, ts + start * 1e3, total * 1e3, step)
+                )
+            self._walk(rec, ts, step)
+
+    def finish(self, model):
+        from Sofa import Simulation, Timer
+
+        Timer.setEnabled(TIMER, False)
+        model.__dict__.pop("animate", None)
+        if self._animate is not None:
+            Simulation.animate = self._animate
+            self._animate = None
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(os.path.join(self.directory, "profile_trace.json"), "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+        labels = sorted(self.totals, key=self.totals.get, reverse=True)
+        summary = {
+            "every": self.every,
+            "steps": self.n_steps,
+            "sampled_steps": self.n_sampled,
+            "mean_step_ms": self.total_ms / max(1, self.n_steps),
+            "min_step_ms": self.min_ms if self.n_steps else 0.0,
+            "max_step_ms": self.max_ms,
+            "step_ms": self.step_ms,
+            "labels": {
+                k: {
+                    "total_ms": self.totals[k],
+                    "count": self.counts[k],
+                    "mean_ms": self.totals[k] / self.counts[k],
+                }
+                for k in labels
+            },
+        }
+        with open(os.path.join(self.directory, "profile_summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+        sampled = self.sampled_ms or 1.0
+        lines = [f"{'label':<50} {'total ms':>12} {'count':>8} {'% step':>8}"]
+        for k in labels[: self.top]:
+            pct = 100 * self.totals[k] / sampled
+            lines.append(
+                f"{k[:50]:<50} {self.totals[k]:>12.2f} {self.counts[k]:>8} {pct:>8.1f}"
+            )
+        report = "\n".join(lines)
+        with open(os.path.join(self.directory, "profile_top.txt"), "w") as f:
+            f.write(report + "\n")
+        log.info(f"Profile (every {self.every} steps):\n{report}")
+
+
+log = logging.getLogger(__name__)
@@ -0,0 +1,132 @@
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+
+class Channel:
+    """
+    Time series of one Data field, stored in preallocated chunks of at most
+    `chunk` samples and `chunk_bytes` bytes (at least one sample). Full chunks
+    are spilled to `spill_dir` as .npy when it is set, and kept in memory
+    otherwise. Pickling (checkpoints) keeps the filled part of the current chunk
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        data: str,
+        dtype=np.float64,
+        every: int = 1,
+        chunk: int = 1024,
+        spill_dir: Optional[str] = None,
+        chunk_bytes: int = 64 << 20,
+    ):
+        self.name = name
+        self.path = path
+        self.data = data
+        self.dtype = np.dtype(dtype)
+        self.every = every
+        self.chunk = chunk
+        self.chunk_bytes = chunk_bytes
+        self.spill_dir = spill_dir
+
+        self.capacity = 0  # samples per chunk, set by the first sample
+        self.buffer: Optional[np.ndarray] = None
+        self.times = np.empty(0)
+        self.size = 0  # samples in the current chunk
+        self.full: List[np.ndarray] = []  # in memory full chunks
+        self.full_times: List[np.ndarray] = []
+        self.spilled = 0
+
+    def append(self, handle, time: float):
+        if hasattr(handle, "array"):
+            value = handle.array()  # read-only view, no copy
+        else:
+            value = handle.value
+
+        if self.buffer is None:
+            shape = np.shape(value)
+            sample = max(1, int(np.prod(shape)) * self.dtype.itemsize)
+            self.capacity = max(1, min(self.chunk, self.chunk_bytes // sample))
+            self._allocate(shape)
+        self.buffer[self.size] = value
+        self.times[self.size] = time
+        self.size += 1
+        if self.size == self.capacity:
+            self._store_chunk()
+
+    def _allocate(self, shape):
+        self.buffer = np.empty((self.capacity, *shape), dtype=self.dtype)
+        self.times = np.empty(self.capacity)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if self.buffer is not None:
+            state["buffer"] = self.buffer[: self.size]
+            state["times"] = self.times[: self.size]
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("chunk_bytes", 64 << 20)
+        state.setdefault("capacity", state["chunk"])
+        buffer, times = state["buffer"], state["times"]
+        self.__dict__.update(state)
+        if buffer is not None and len(buffer) < self.capacity:
+            self._allocate(buffer.shape[1:])
+            self.buffer[: self.size] = buffer[: self.size]
+            self.times[: self.size] = times[: self.size]
+
+    def __deepcopy__(self, memo):
+        # samples past `size` are never read and full chunks never written, so
+        # a copy shares the arrays: a cheap rollback point, see AdaptiveStepper
+        new = Channel.__new__(Channel)
+        new.__dict__.update(self.__dict__)
+        new.full = list(self.full)
+        new.full_times = list(self.full_times)
+        memo[id(self)] = new
+        return new
+
+    def _store_chunk(self):
+        if self.spill_dir is None:
+            self.full.append(self.buffer)
+            self.full_times.append(self.times)
+            self._allocate(self.buffer.shape[1:])
+        else:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            base = os.path.join(self.spill_dir, f"{self.name}_{self.spilled:05d}")
+            np.save(f"{base}.npy", self.buffer)
+            np.save(f"{base}_t.npy", self.times)
+            self.spilled += 1
+        self.size = 0
+
+    def _parts(self, suffix, memory, current):
+        parts = [
+            np.load(
+                os.path.join(self.spill_dir, f"{self.name}_{i:05d}{suffix}.npy"),
+                mmap_mode="r",
+            )
+            for i in range(self.spilled)
+        ]
+        parts.extend(memory)
+        if current is not None:
+            parts.append(current[: self.size])
+        return parts
+
+    def series(self) -> np.ndarray:
+        """
+        Recorded values, shape (n_samples, *data_shape)
+        """
+        parts = self._parts("", self.full, self.buffer)
+        if not parts:
+            return np.empty((0,), dtype=self.dtype)
+        return np.concatenate(parts)
+
+    def time(self) -> np.ndarray:
+        parts = self._parts("_t", self.full_times, self.times)
+        return np.concatenate(parts) if parts else np.empty(0)
+
+
+log = logging.getLogger(__name__)
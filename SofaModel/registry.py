@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+import treefiles as tf
+
+from SofaModel.cache import file_digest, params_digest
+
+
+class RunRegistry:
+    """
+    Index of completed runs keyed by a hash of their parameters (the content of
+    params.json, out_dir excluded and input files replaced by the hash of their
+    content), model and scene classes. A run whose key is registered with an
+    intact output directory does not need to be simulated again. Only complete
+    runs are registered: run to the end, or stopped by a converged criterion.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def _canonical(obj, out_dir: str):
+        if isinstance(obj, dict):
+            return {k: RunRegistry._canonical(v, out_dir) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [RunRegistry._canonical(v, out_dir) for v in obj]
+        if isinstance(obj, str):
+            # files written in the run directory are outputs, or inputs named
+            # after their content (see MecaModel.set_data_path)
+            if out_dir and (obj == out_dir or obj.startswith(out_dir + os.sep)):
+                return "<out_dir>" + obj[len(out_dir) :]
+            if os.path.isfile(obj):
+                return f"sha256:{file_digest(obj)}"
+        return obj
+
+    def key(self, model) -> str:
+        params = json.loads(json.dumps(model.params.to_dict(), cls=tf.JsonEncoder))
+        out_dir = str(model.params.out_dir.value).rstrip(os.sep)
+        params.pop("out_dir", None)
+        name = lambda obj: f"{type(obj).__module__}.{type(obj).__qualname__}"
+        return params_digest(
+            {
+                "model": name(model),
+                "scene": name(model.scene),
+                "params": self._canonical(params, out_dir),
+            }
+        )
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    @staticmethod
+    def manifest(out_dir) -> dict:
+        files = {}
+        for r, _, fs in os.walk(out_dir):
+            for f in fs:
+                p = os.path.join(r, f)
+                files[os.path.relpath(p, out_dir)] = os.path.getsize(p)
+        return files
+
+    @staticmethod
+    def intact(entry: dict) -> bool:
+        for rel, size in entry["manifest"].items():
+            p = os.path.join(entry["out_dir"], rel)
+            if not os.path.isfile(p) or os.path.getsize(p) != size:
+                return False
+        return True
+
+    @staticmethod
+    def complete(stop: Optional[dict]) -> bool:
+        """
+        Whether a stop.json describes a complete run, not one cut short by a
+        budget (WallClock, Threshold, ...)
+        """
+        if stop is None:
+            return False
+        return not stop.get("early") or bool(stop.get("converged"))
+
+    def lookup(self, key: str) -> Optional[dict]:
+        if not os.path.isfile(self.path(key)):
+            return
+        entry = tf.load_json(self.path(key))
+        if not self.complete(entry.get("stop")):
+            log.warning(f"Run {key} did not complete, running again")
+            return
+        if not self.intact(entry):
+            log.warning(f"Output of run {key} is missing or modified, running again")
+            return
+        return entry
+
+    def record(self, model, key: str) -> Optional[dict]:
+        """
+        Register a finished run, None when it was cut short
+        """
+        out_dir = str(model.params.out_dir.value)
+        stop = os.path.join(out_dir, "stop.json")
+        stop = tf.load_json(stop) if os.path.isfile(stop) else None
+        if not self.complete(stop):
+            reason = stop and stop["reason"]
+            log.info(f"Run {key} stopped early ({reason}), not registered")
+            return
+        entry = {
+            "key": key,
+            "out_dir": os.path.abspath(out_dir),
+            "finished": time.time(),
+            "stop": stop,
+            "manifest": self.manifest(out_dir),
+        }
+        tmp = f"{self.path(entry['key'])}.tmp{os.getpid()}"
+        tf.dump_json(tmp, entry, cls=tf.JsonEncoder)
+        os.replace(tmp, self.path(entry["key"]))
+        return entry
+
+
+log = logging.getLogger(__name__)
@@ -0,0 +1,209 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+from SofaModel.load_SOFA import load_SOFA
+from SofaModel.sweep import class_path, run_one
+from SofaModel.threads import set_thread_env
+
+
+def _recv_line(conn) -> bytes:
+    buf = b""
+    while not buf.endswith(b"\n"):
+        chunk = conn.recv(1 << 16)
+        if not chunk:
+            break
+        buf += chunk
+    return buf
+
+
+class WarmServer:
+    """
+    Long-lived worker importing SOFA and the plugins once, then serving run jobs
+    (see `sweep.run_one`) sent as json lines on a Unix socket. Each job is run
+    in a child forked from the warm server, at most `workers` at a time, so
+    leaks and state of previous scenes never reach the next job. The BLAS/OpenMP
+    runtimes are loaded with `threads` threads, shared by all the jobs.
+    """
+
+    def __init__(
+        self,
+        socket_path,
+        plugins: Iterable[str] = (),
+        workers: int = 1,
+        threads: int = 1,
+    ):
+        self.socket_path = str(socket_path)
+        self.plugins = list(plugins)
+        self.workers = workers
+        self.threads = threads
+        self.children = set()
+        self._stopping = False
+
+    def warm_up(self):
+        t = time.perf_counter()
+        set_thread_env(self.threads)
+        load_SOFA()
+        import Sofa.Core
+        import Sofa.Simulation
+        import SofaRuntime
+
+        SofaRuntime.PluginRepository.addFirstPath(
+            os.path.join(os.environ["SOFA_ROOT"], "lib")
+        )
+        for x in self.plugins:
+            SofaRuntime.importPlugin(x)
+        log.info(
+            f"SOFA and {len(self.plugins)} plugins loaded in "
+            f"{time.perf_counter() - t:.2f}s"
+        )
+
+    def _spawn(self, listener, conn):
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            conn.close()
+            return
+        # child
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        listener.close()
+        code = 0
+        try:
+            set_thread_env(self.threads)
+            with conn:
+                self._handle(conn)
+        except BaseException:
+            log.exception("Worker failed")
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def _handle(self, conn):
+        try:
+            job = json.loads(_recv_line(conn))
+            row = run_one(job)
+        except Exception as e:
+            row = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+        conn.sendall(json.dumps(row, default=str).encode() + b"\n")
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self, block: bool):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if not pid:
+                return
+            self.children.discard(pid)
+            if status and not self._stopping:
+                log.warning(f"Worker {pid} exited with status {status}")
+            if block:
+                return
+
+    def serve(self):
+        self.warm_up()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        listener.listen(max(16, self.workers * 4))
+        listener.settimeout(1.0)  # check self._stopping between connections
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        log.info(f"Serving on {self.socket_path} with {self.workers} workers")
+
+        try:
+            while not self._stopping:
+                self._reap(block=False)
+                if len(self.children) >= self.workers:
+                    self._reap(block=True)
+                    continue
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                self._spawn(listener, conn)
+            while self.children:
+                self._reap(block=True)
+        finally:
+            listener.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+class Client:
+    """
+    Submit jobs to a WarmServer and wait for their results
+    """
+
+    def __init__(self, socket_path, timeout: Optional[float] = None):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+
+    @staticmethod
+    def job(model, scene, params, out_dir, variant=None, **kw) -> dict:
+        """
+        :param params: dict of the base params, e.g. `tf.Params.to_dict()`
+        """
+        job = {
+            "name": os.path.basename(os.path.normpath(str(out_dir))),
+            "model": class_path(model),
+            "scene": class_path(scene),
+            "params": params,
+            "variant": variant or {},
+            "out_dir": str(out_dir),
+            "std_to_file": True,
+            "registry": None,
+            "force": False,
+        }
+        job.update(kw)
+        return job
+
+    def run(self, job: dict) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            conn.sendall(json.dumps(job, default=str).encode() + b"\n")
+            reply = _recv_line(conn)
+        if not reply:
+            return {"name": job.get("name"), "status": "crashed", "error": "no reply"}
+        return json.loads(reply)
+
+    def map(self, jobs: Iterable[dict], parallel: int = 1) -> List[dict]:
+        with ThreadPoolExecutor(parallel) as pool:
+            return list(pool.map(self.run, jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm SOFA worker server")
+    parser.add_argument("socket", help="Unix socket path")
+    parser.add_argument("--plugins", nargs="*", default=[])
+    parser.add_argument("-j", "--workers", type=int, default=1)
+    parser.add_argument("-t", "--threads", type=int, default=1)
+    args = parser.parse_args(argv)
+    WarmServer(args.socket, args.plugins, args.workers, args.threads).serve()
+    return 0
+
+
+log = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -1,6 +1,14 @@
+import json
 import logging
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
 
-from Model3D.basesofamodel.load_SOFA import load_SOFA
+import numpy as np
+
+from SofaModel.export import ExportConfig, ExportWriter, zone_nodes
+from SofaModel.load_SOFA import load_SOFA
+from SofaModel.recorder import Channel
+from SofaModel.store import ResultStore
 
 load_SOFA()
 from Sofa.Core import Controller
@@ -8,37 +16,286 @@ from Sofa.Core import Controller
 
 class SOFAControl(Controller):
     def __init__(self, root, **kw):
+        self.out = kw.pop("out", None)
         super().__init__(**kw)
         self.root = root
         self.data = []
-        self.out = kw.pop("out", None)
+        self.step = 0
+        self.channels: Dict[str, Channel] = {}
+        self._handles = {}
+        self.writer: Optional[ExportWriter] = None
+        self.hold_exports = False  # exports called by AdaptiveStepper instead
 
     def export(self):
         pass
 
+    def export_async(self, directory=None, max_queue: int = 8, write=None):
+        """
+        Route `submit` through a background ExportWriter
+        """
+        if directory is None:
+            directory = os.path.join(str(self.out), "exports")
+        self.writer = ExportWriter(directory, max_queue, write)
+
+    def submit(self, **arrays):
+        """
+        Snapshot `arrays` for the current step, to be called from `export`
+        """
+        if self.writer is None:
+            self.export_async()
+        self.writer.submit(self.step, self.root.time.value, **arrays)
+
+    def close_exports(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def record(
+        self, name, path, data, dtype=float, every=1, chunk=1024, chunk_bytes=64 << 20
+    ):
+        """
+        Record `root[path].data` every `every` steps, see `series` and Channel
+        """
+        spill_dir = None
+        if self.out is not None:
+            spill_dir = os.path.join(str(self.out), "recorder")
+        self.channels[name] = Channel(
+            name, path, data, dtype, every, chunk, spill_dir, chunk_bytes
+        )
+
+    def series(self, name):
+        """
+        (times, values) recorded for channel `name`
+        """
+        ch = self.channels[name]
+        return ch.time(), ch.series()
+
+    def get_state(self):
+        """
+        Picklable controller state stored in checkpoints
+        """
+        return {"data": self.data, "step": self.step, "channels": self.channels}
+
+    def set_state(self, state):
+        self.data = state["data"]
+        self.step = state.get("step", 0)
+        self.channels = state.get("channels", self.channels)
+
     def onAnimateBeginEvent(self, event):
-        if self.root.time.value == 0:
+        if self.root.time.value == 0 and not self.hold_exports:
             self.export()
 
     def onAnimateEndEvent(self, event):
-        self.export()
+        self.step += 1
+        for ch in self.channels.values():
+            if self.step % ch.every == 0:
+                ch.append(self.handle(ch.path, ch.data), self.root.time.value)
+        if not self.hold_exports:
+            self.export()
+
+    def handle(self, path, data):
+        """
+        Data `data` of the object at `path`, resolved once then cached
+        """
+        key = (path, data)
+        if key not in self._handles:
+            try:
+                obj = self.root[path]
+            except Exception as e:
+                raise KeyError(f"No object at {path!r}") from e
+            if obj is None:
+                raise KeyError(f"No object at {path!r}")
+            d = obj.findData(data)
+            if d is None:
+                raise KeyError(f"{path!r} has no Data {data!r}")
+            self._handles[key] = d
+        return self._handles[key]
 
     def get(self, path, data):
-        try:
-            obj = self.root[path].findData(data).value
-        except:
-            return
-        return obj
+        return self.handle(path, data).value
 
     def set(self, path, data, value):
-        try:
-            self.root[path].findData(data).value = value
-        except:
-            return
+        self.handle(path, data).value = value
+
+    def get_many(self, keys: Iterable[Tuple[str, str]]) -> list:
+        return [self.handle(path, data).value for path, data in keys]
+
+    def set_many(self, values: Dict[Tuple[str, str], Any]):
+        for (path, data), value in values.items():
+            self.handle(path, data).value = value
+
+    def view(self, path, data) -> np.ndarray:
+        """
+        Read-only array sharing the memory of the Data buffer, valid until the
+        Data is resized
+        """
+        return self.handle(path, data).array()
+
+    def writeable(self, path, data):
+        """
+        Context manager giving a writeable array on the Data buffer, the Data is
+        marked as modified on exit:
+            with ctrl.writeable("MecaNode/mecaObj", "position") as x:
+                x[fixed] = x0
+        """
+        return self.handle(path, data).writeableArray()
 
     # def onAnimateEndEvent(self, event):
     #     V = self.root["APIVersion"].findData("level").value
     #     print("onAnimateBeginEvent", event, V)
 
 
+class StoreExporter(SOFAControl):
+    """
+    Append Data fields every `every` steps to a single ResultStore file, written
+    in the background. `fields` and `topology` map a name to (path, data):
+        StoreExporter(
+            root,
+            path=out / "results.bin",
+            fields={"position": ("MecaNode/mecaObj", "position")},
+            topology={"tetrahedra": ("MecaNode/ContainerTetra", "tetrahedra")},
+        )
+    """
+
+    def __init__(self, root, path, fields, topology=None, every=1, **kw):
+        super().__init__(root, **kw)
+        self.path = str(path)
+        self.fields = fields
+        self.topology = topology or {}
+        self.every = every
+        self.store: Optional[ResultStore] = None
+        self.frames = 0  # submitted
+        self.export_async(os.path.dirname(self.path), write=self._write)
+
+    def get_state(self):
+        return dict(super().get_state(), frames=self.frames)
+
+    def set_state(self, state):
+        super().set_state(state)
+        # resumed run, the frames after the checkpoint are written again
+        if self.store is None and "frames" in state and os.path.exists(self.path):
+            self.frames = state["frames"]
+            self.store = ResultStore.open(self.path, "a")
+            self.store.truncate(self.frames)
+
+    def export(self):
+        if self.step % self.every:
+            return
+        arrays = {k: self.view(*v) for k, v in self.fields.items()}
+        if self.store is None:
+            self.store = ResultStore.create(
+                self.path,
+                {k: (v.dtype, v.shape) for k, v in arrays.items()},
+                **{k: self.view(*v) for k, v in self.topology.items()},
+            )
+        self.submit(**arrays)
+        self.frames += 1
+
+    def _write(self, directory, step, time, arrays):
+        self.store.append(time, **arrays)
+
+    def close_exports(self):
+        super().close_exports()
+        if self.store is not None:
+            self.store.close()
+
+
+class ConfiguredExporter(SOFAControl):
+    """
+    Export the fields of an ExportConfig to one ResultStore per decimation rate
+    in `directory` (rate_<every>.bin, a frame holding the step and the fields
+    of that rate), written in the background. The config and the node indices
+    of the zones are saved once to export_config.json and zones.npz, see
+    `read_exports`
+    """
+
+    def __init__(self, root, config: ExportConfig, directory, **kw):
+        super().__init__(root, **kw)
+        self.config = config
+        self.directory = str(directory)
+        self.nodes: Optional[Dict[str, np.ndarray]] = None
+        self.stores: Dict[int, ResultStore] = {}
+        self.frames: Dict[int, int] = {}  # submitted per rate
+        self.export_async(self.directory, write=self._write)
+
+    def _path(self, every: int) -> str:
+        return os.path.join(self.directory, f"rate_{every}.bin")
+
+    def get_state(self):
+        return dict(super().get_state(), frames=dict(self.frames))
+
+    def set_state(self, state):
+        super().set_state(state)
+        # resumed run, the frames after the checkpoint are written again
+        if self.stores or "frames" not in state:
+            return
+        self.frames = dict(state["frames"])
+        for every, n in self.frames.items():
+            if os.path.exists(self._path(every)):
+                self.stores[every] = ResultStore.open(self._path(every), "a")
+                self.stores[every].truncate(n)
+
+    def _zones(self) -> Dict[str, np.ndarray]:
+        nodes = {}
+        for zone in self.config.zones():
+            if self.config.loader is None:
+                raise ValueError(f"Zone {zone!r} exported without a loader")
+            loader = self.root[self.config.loader]
+
+            def pick(name):
+                d = loader.findData(name)
+                return None if d is None else d.value
+
+            nodes[zone] = zone_nodes(
+                zone,
+                (pick("pointZoneNames"), pick("pointZones")),
+                (pick("surfaceZoneNames"), pick("surfaceZones")),
+            )
+        with open(os.path.join(self.directory, "export_config.json"), "w") as f:
+            json.dump(self.config.to_dict(), f, indent=2)
+        np.savez(os.path.join(self.directory, "zones.npz"), **nodes)
+        return nodes
+
+    def export(self):
+        due = self.config.due(self.step)
+        if not due:
+            return
+        if self.nodes is None:
+            self.nodes = self._zones()
+        arrays = {
+            k: f.encode(self.view(f.path, f.data), self.nodes.get(f.zone))
+            for k, f in due.items()
+        }
+        for every in {f.every for f in due.values()} - set(self.stores):
+            fields = {"step": ("<i8", ())}
+            for k, f in due.items():
+                if f.every == every:
+                    fields[k] = (arrays[k].dtype, arrays[k].shape)
+            self.stores[every] = ResultStore.create(self._path(every), fields)
+        self.submit(**arrays)
+        for every in {f.every for f in due.values()}:
+            self.frames[every] = self.frames.get(every, 0) + 1
+
+    def _write(self, directory, step, time, arrays):
+        for store in list(self.stores.values()):  # grown by export
+            values = {k: arrays[k] for k in store.fields if k in arrays}
+            if len(values) == len(store.fields) - 1:  # due at this step
+                store.append(time, step=step, **values)
+
+    def drop(self, first: int) -> int:
+        """
+        Remove the frames of the steps before `first`, once the exports are
+        closed. Returns the number of removed frames
+        """
+        removed = 0
+        for store in self.stores.values():
+            n = int(np.searchsorted(store["step"], first))
+            store.drop(n)
+            removed += n
+        return removed
+
+    def close_exports(self):
+        super().close_exports()
+        for store in self.stores.values():
+            store.close()
+
 log = logging.getLogger(__name__)
@@ -0,0 +1,441 @@
+"""
+Declarative scene specs, JSON (or YAML) trees of nodes with "data", "objects"
+and "children" whose values may reference the run parameters
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Set, Union
+
+from SofaModel.base_model import BaseScene
+from SofaModel.cache import InputCache, params_digest
+from SofaModel.plugins import RecordingNode
+
+_TEMPLATE = re.compile(r"\$\{(\w+)\}")
+_REF = re.compile(r"^\$(\w+)$")
+
+PARAM_TYPES = {
+    "float": (int, float),
+    "int": (int,),
+    "bool": (bool,),
+    "str": (str,),
+    "file": (str, os.PathLike),
+    "any": (object,),
+}
+
+
+def coerce(value, kind: str):
+    """
+    Value of a declared parameter type, numeric and boolean strings (as found in
+    params.json files) converted. Raises ValueError when it does not match
+    """
+    if isinstance(value, str) and kind in ("int", "float", "bool"):
+        text = value.strip()
+        if kind == "bool":
+            if text.lower() not in ("true", "false", "1", "0"):
+                raise ValueError(text)
+            return text.lower() in ("true", "1")
+        return int(text) if kind == "int" else float(text)
+    if not isinstance(value, PARAM_TYPES[kind]) or (
+        kind in ("int", "float") and isinstance(value, bool)
+    ):
+        raise ValueError(value)
+    return value
+
+
+class SpecError(ValueError):
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("Invalid scene spec:\n  " + "\n  ".join(errors))
+
+
+def load(path) -> dict:
+    path = str(path)
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to read YAML scene specs")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def references(value) -> Set[str]:
+    """
+    Parameters referenced by a spec value
+    """
+    if isinstance(value, str):
+        if value.startswith("$$"):
+            return set()
+        m = _REF.match(value)
+        return {m.group(1)} if m else set(_TEMPLATE.findall(value))
+    if isinstance(value, dict):
+        return set().union(*map(references, value.values()))
+    if isinstance(value, list):
+        return set().union(*map(references, value))
+    return set()
+
+
+def resolve(value, lookup):
+    """
+    "$NAME" is the raw value, "${NAME}" is formatted in a string, {"$join": []}
+    joins with spaces, {"$sum": []} adds and "$$" escapes a leading "$"
+    """
+    if isinstance(value, str):
+        if value.startswith("$$"):
+            return value[1:]
+        m = _REF.match(value)
+        if m:
+            return lookup(m.group(1))
+        return _TEMPLATE.sub(lambda m: str(lookup(m.group(1))), value)
+    if isinstance(value, dict):
+        if set(value) == {"$join"}:
+            return " ".join(str(resolve(v, lookup)) for v in value["$join"])
+        if set(value) == {"$sum"}:
+            return sum(float(resolve(v, lookup)) for v in value["$sum"])
+        return {k: resolve(v, lookup) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve(v, lookup) for v in value]
+    return value
+
+
+class SceneSpec:
+    """
+    Validated scene description. The structure is checked once, `compile` then
+    only resolves the parameter references, optionally through an InputCache
+    keyed by the spec and the referenced values
+    """
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.declared: Dict[str, dict] = {}
+        for name, decl in spec.get("params", {}).items():
+            decl = decl if isinstance(decl, dict) else {"type": decl}
+            self.declared[name] = decl
+        self.digest = params_digest(spec)
+        self.references: Set[str] = set()
+
+        errors = []
+        for name, decl in self.declared.items():
+            if decl.get("type", "any") not in PARAM_TYPES:
+                errors.append(f"params.{name}: unknown type {decl['type']!r}")
+        self._check_node(spec, "root", errors, top=True)
+        if errors:
+            raise SpecError(errors)
+
+    @classmethod
+    def from_file(cls, path) -> "SceneSpec":
+        return cls(load(path))
+
+    def _check_node(self, node: dict, where: str, errors: list, top=False):
+        allowed = {"name", "data", "objects", "children"}
+        if top:
+            allowed |= {"params", "version"}
+        for k in set(node) - allowed:
+            errors.append(f"{where}: unknown key {k!r}")
+        self.references |= references(node.get("data", {}))
+
+        names = set()
+        for i, obj in enumerate(node.get("objects", [])):
+            here = f"{where}.objects[{i}]"
+            if not isinstance(obj, dict) or not isinstance(obj.get("type"), str):
+                errors.append(f"{here}: expected an object with a 'type'")
+                continue
+            name = obj.get("name")
+            if name is not None:
+                if name in names:
+                    errors.append(f"{here}: duplicated name {name!r}")
+                names.add(name)
+            self.references |= references(obj)
+
+        children = set()
+        for i, child in enumerate(node.get("children", [])):
+            name = child.get("name") if isinstance(child, dict) else None
+            if not isinstance(name, str):
+                errors.append(f"{where}.children[{i}]: expected a node with a 'name'")
+                continue
+            if name in children | names:
+                errors.append(f"{where}/{name}: duplicated name")
+            children.add(name)
+            self._check_node(child, f"{where}/{name}", errors)
+
+    def check_params(self, params) -> List[str]:
+        errors = []
+        for name in sorted(self.references | set(self.declared)):
+            decl = self.declared.get(name, {})
+            if name not in params:
+                if "default" not in decl:
+                    errors.append(f"missing parameter {name!r}")
+                continue
+            value = params[name].value
+            kind = decl.get("type", "any")
+            try:
+                coerce(value, kind)
+            except ValueError:
+                errors.append(f"parameter {name!r} = {value!r} is not of type {kind!r}")
+                continue
+            if kind == "file" and not os.path.isfile(str(value)):
+                errors.append(f"parameter {name!r}: no file {str(value)!r}")
+        return errors
+
+    def values(self, params) -> dict:
+        """
+        Referenced parameter values, converted to their declared type
+        """
+        out = {}
+        for name in self.references:
+            if name in params:
+                kind = self.declared.get(name, {}).get("type", "any")
+                out[name] = coerce(params[name].value, kind)
+            else:
+                out[name] = self.declared[name]["default"]
+        return out
+
+    def compile(self, params, cache: Optional[InputCache] = None) -> dict:
+        """
+        Graph with every reference resolved, the links checked, as a tree of
+        {"name", "data", "objects": [{"type", "kwargs"}], "children"}
+        """
+        errors = self.check_params(params)
+        if errors:
+            raise SpecError(errors)
+        values = self.values(params)
+        if cache is None:
+            return self._compile(values)
+
+        key = params_digest(["scene-graph", self.digest, values])
+        create = lambda p: _dump(p, self._compile(values))
+        path = cache.get_or_create(key, "graph.json", create)
+        with open(path) as f:
+            return json.load(f)
+
+    def _compile(self, values: dict) -> dict:
+        graph = self._resolve_node(self.spec, values.__getitem__, "root")
+        graph = json.loads(json.dumps(graph, default=str))  # as read from the cache
+        errors = []
+        _check_links(graph, graph, "/", errors)
+        if errors:
+            raise SpecError(errors)
+        return graph
+
+    def _resolve_node(self, node: dict, lookup, name: str) -> dict:
+        return {
+            "name": name,
+            "data": resolve(node.get("data", {}), lookup),
+            "objects": [
+                {
+                    "type": obj["type"],
+                    "kwargs": resolve(
+                        {k: v for k, v in obj.items() if k != "type"}, lookup
+                    ),
+                }
+                for obj in node.get("objects", [])
+            ],
+            "children": [
+                self._resolve_node(c, lookup, c["name"])
+                for c in node.get("children", [])
+            ],
+        }
+
+
+def _dump(path, graph: dict):
+    with open(path, "w") as f:
+        json.dump(graph, f)
+
+
+def _find(node: dict, parents: list, path: str) -> bool:
+    for part in path.split("/"):
+        if part in ("", "."):
+            continue
+        if part == "..":
+            if not parents:
+                return False
+            node, parents = parents[-1], parents[:-1]
+            continue
+        child = [c for c in node["children"] if c["name"] == part]
+        if child:
+            parents, node = parents + [node], child[0]
+            continue
+        objs = [o for o in node["objects"] if o["kwargs"].get("name") == part]
+        if not objs:
+            return False
+        node = {"children": [], "objects": []}  # objects have no children
+    return True
+
+
+def _check_links(node: dict, root: dict, where: str, errors: list, parents=()):
+    parents = list(parents)
+    for obj in node["objects"]:
+        for k, v in obj["kwargs"].items():
+            if not (isinstance(v, str) and v.startswith("@")):
+                continue
+            for link in v.split():
+                head, sep, last = link[1:].rpartition("/")
+                if last not in ("", ".", "..") and "." in last:  # link to a Data
+                    last = last.rsplit(".", 1)[0]
+                target = head + sep + last
+                if target.startswith("/"):
+                    found = _find(root, [], target)
+                else:
+                    found = _find(node, parents, target)
+                if not found:
+                    label = obj["kwargs"].get("name", obj["type"])
+                    errors.append(f"{where}{label}.{k}: broken link {link!r}")
+    for child in node["children"]:
+        where_child = f"{where}{child['name']}/"
+        _check_links(child, root, where_child, errors, parents + [node])
+
+
+def build(node, graph: dict):
+    """
+    Add a compiled graph to a SOFA (or recording) node
+    """
+    for k, v in graph["data"].items():
+        node.findData(k).value = v
+    for obj in graph["objects"]:
+        node.addObject(obj["type"], **obj["kwargs"])
+    for child in graph["children"]:
+        build(node.addChild(child["name"]), child)
+
+
+class SpecScene(BaseScene):
+    """
+    Scene built from a SceneSpec (or the path of a spec file), set as an
+    argument or as the SPEC class attribute. `cache=True` keeps the compiled
+    graphs in the default InputCache
+    """
+
+    SPEC: Union[None, str, dict] = None
+
+    def __init__(self, spec=None, cache: Union[None, bool, InputCache] = None):
+        super().__init__()
+        spec = self.SPEC if spec is None else spec
+        if spec is None:
+            raise ValueError(f"{type(self).__name__} has no spec, pass one or set SPEC")
+        if isinstance(spec, (str, os.PathLike)):
+            spec = SceneSpec.from_file(spec)
+        elif isinstance(spec, dict):
+            spec = SceneSpec(spec)
+        self.spec: SceneSpec = spec
+        self.cache = InputCache() if cache is True else cache or None
+        self.graph = None
+
+    def init(self):
+        self.graph = self.spec.compile(self.params, self.cache)
+        build(self.root, self.graph)
+
+
+def record(scene: BaseScene, params) -> RecordingNode:
+    root = RecordingNode()
+    scene.real_init(root, params)
+    scene.init()
+    return root
+
+
+def _spec_node(node: RecordingNode) -> dict:
+    out = {"name": node.name}
+    data = {k: d.value for k, d in node._data.items() if d.value is not None}
+    if data:
+        out["data"] = data
+    out["objects"] = [{"type": o.type, **o.kwargs} for o in node.objects]
+    if node.children:
+        out["children"] = [_spec_node(c) for c in node.children]
+    return out
+
+
+def from_scene(scene: BaseScene, params) -> dict:
+    """
+    Spec of an imperative scene with the values of `params`, a starting point to
+    port it (python controllers are not recorded)
+    """
+    spec = _spec_node(record(scene, params))
+    spec.pop("name")
+    return json.loads(json.dumps(spec, default=str))
+
+
+def _attr(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        return " ".join(map(_attr, value))
+    if hasattr(value, "tolist"):
+        return _attr(value.tolist())
+    return str(value)
+
+
+def _scn_node(node: RecordingNode, parent=None) -> ET.Element:
+    attrs = {"name": node.name}
+    attrs.update(
+        {k: _attr(d.value) for k, d in node._data.items() if d.value is not None}
+    )
+    if parent is None:
+        el = ET.Element("Node", attrs)
+    else:
+        el = ET.SubElement(parent, "Node", attrs)
+    for obj in node.objects:
+        ET.SubElement(el, obj.type, {k: _attr(v) for k, v in obj.kwargs.items()})
+    for child in node.children:
+        _scn_node(child, el)
+    return el
+
+
+def to_scn(scene: BaseScene, params, path=None) -> str:
+    """
+    XML scene for runSofa, from a SpecScene or any BaseScene
+    """
+    root = _scn_node(record(scene, params))
+    ET.indent(root)
+    text = ET.tostring(root, encoding="unicode") + "\n"
+    if path is not None:
+        with open(str(path), "w") as f:
+            f.write(text)
+    return text
+
+
+def _scene(arg: str) -> BaseScene:
+    if ":" in arg and not os.path.exists(arg):
+        from SofaModel.sweep import load_class
+
+        return load_class(arg)()
+    return SpecScene(arg)
+
+
+def main(argv=None):
+    import treefiles as tf
+
+    parser = argparse.ArgumentParser(description="Scene spec tools")
+    parser.add_argument("command", choices=["check", "scn", "dump"])
+    parser.add_argument("scene", help="Spec file, or BaseScene 'module:Class'")
+    parser.add_argument("params", help="params.json")
+    parser.add_argument("-o", "--output", help="Output file, stdout by default")
+    args = parser.parse_args(argv)
+
+    params = tf.Params.from_dict(tf.load_json(args.params))
+    scene = _scene(args.scene)
+    if args.command == "check":
+        if not isinstance(scene, SpecScene):
+            parser.error("check expects a spec file")
+        scene.spec.compile(params)
+        print(f"{args.scene}: ok ({len(scene.spec.references)} parameters)")
+        return 0
+    if args.command == "scn":
+        text = to_scn(scene, params)
+    else:
+        text = json.dumps(from_scene(scene, params), indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text, end="")
+    return 0
+
+
+log = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
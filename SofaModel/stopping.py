@@ -0,0 +1,111 @@
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from SofaModel.hooks import RunHook
+
+
+def read(model, path: str, data: str) -> np.ndarray:
+    """
+    Data value through the scene controller cached handles when there is one
+    """
+    controller = model.scene.controller
+    if controller is not None:
+        return controller.view(path, data)
+    return np.asarray(model.root[path].findData(data).value)
+
+
+class StoppingCriterion(RunHook):
+    """
+    Evaluated every `every` steps, `check` returns the reason to stop or None.
+    CONVERGED criteria end the run on a result (the run counts as complete),
+    the others cut it short
+    """
+
+    CONVERGED = False
+
+    def __init__(self, every: int = 1):
+        self.every = max(1, every)
+
+    def check(self, model) -> Optional[str]:
+        pass
+
+    def after_step(self, model):
+        if model.step % self.every == 0:
+            reason = self.check(model)
+            if reason:
+                model.stop(reason, converged=self.CONVERGED)
+
+
+class SteadyState(StoppingCriterion):
+    """
+    Stop when the relative change of a Data between two checks stayed below
+    `tol` for `window` consecutive checks
+    """
+
+    CONVERGED = True
+    STATE = ("changes", "_last")
+
+    def __init__(self, path, data="position", tol=1e-6, window=10, every=1):
+        super().__init__(every)
+        self.path = path
+        self.data = data
+        self.tol = tol
+        self.changes = deque(maxlen=window)
+        self._last = None
+
+    def check(self, model):
+        x = np.array(read(model, self.path, self.data), dtype=float)
+        if self._last is not None:
+            scale = np.linalg.norm(self._last) or 1.0
+            self.changes.append(np.linalg.norm(x - self._last) / scale)
+        self._last = x
+        if len(self.changes) == self.changes.maxlen and max(self.changes) < self.tol:
+            return (
+                f"steady state: {self.path}.{self.data} changed less than "
+                f"{self.tol:g} over {self.changes.maxlen} checks"
+            )
+
+
+class Threshold(StoppingCriterion):
+    """
+    Stop when max (or min with `above=False`) of a Data crosses `value`
+    """
+
+    def __init__(self, path, data, value, above=True, every=1):
+        super().__init__(every)
+        self.path = path
+        self.data = data
+        self.value = value
+        self.above = above
+
+    def check(self, model):
+        x = read(model, self.path, self.data)
+        if self.above and np.max(x) > self.value:
+            return f"threshold: max {self.path}.{self.data} > {self.value:g}"
+        if not self.above and np.min(x) < self.value:
+            return f"threshold: min {self.path}.{self.data} < {self.value:g}"
+
+
+class WallClock(StoppingCriterion):
+    """
+    Stop once the loop has been running for `seconds`
+    """
+
+    def __init__(self, seconds: float, every=1):
+        super().__init__(every)
+        self.seconds = seconds
+        self._t0 = None
+
+    def start(self, model):
+        self._t0 = time.monotonic()
+
+    def check(self, model):
+        if time.monotonic() - self._t0 > self.seconds:
+            return f"wall clock budget of {self.seconds:g}s reached"
+
+
+log = logging.getLogger(__name__)
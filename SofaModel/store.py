@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import shutil
+import struct
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"SOFARES1"
+ALIGN = 64
+VTK_CELL_TYPES = {"tetrahedra": (4, 10), "triangles": (3, 5)}
+
+
+def _align(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+def _rows(a) -> list:
+    return [" ".join(f"{c:.9g}" for c in row) for row in np.asarray(a, dtype=float)]
+
+
+class ResultStore:
+    """
+    Time series of per-node fields in a single binary file:
+        magic | header size | json header | topology arrays | frames
+    The topology (positions at rest, tetrahedra, ...) is written once and every
+    frame is one fixed-size record (time + fields), so the file is read as a
+    memory map without loading it: `store["position"]` is a view of shape
+    (n_frames, n_nodes, 3). A frame left incomplete by a crash is ignored.
+    """
+
+    def __init__(self, path, header: dict, mode: str):
+        self.path = str(path)
+        self.header = header
+        self.mode = mode
+        self.dtype = np.dtype(
+            [("time", "<f8")]
+            + [(k, np.dtype(d), tuple(s)) for k, d, s in header["fields"]]
+        )
+        self._file = open(self.path, "ab") if mode == "w" else None
+        self._mm = None
+        self._mm_frames = -1
+
+    @classmethod
+    def create(
+        cls,
+        path,
+        fields: Dict[str, Tuple[str, Tuple[int, ...]]],
+        **topology: np.ndarray,
+    ) -> "ResultStore":
+        """
+        :param fields: name -> (dtype, shape of one frame)
+        :param topology: arrays written once, e.g. points=..., tetrahedra=...
+        """
+        topology = {k: np.ascontiguousarray(v) for k, v in topology.items()}
+        entries, relative, offset = {}, {}, 0
+        for k, v in topology.items():
+            entries[k] = {"dtype": v.dtype.str, "shape": v.shape}
+            relative[k] = offset
+            offset = _align(offset + v.nbytes)
+
+        header = {
+            "fields": [[k, np.dtype(d).str, list(s)] for k, (d, s) in fields.items()],
+            "topology": entries,
+        }
+        # offsets depend on the header size, grow it until the json fits
+        start, prefix = ALIGN, len(MAGIC) + 8
+        while True:
+            for k, e in entries.items():
+                e["offset"] = start + relative[k]
+            header["frame_offset"] = _align(start + offset)
+            body = json.dumps(header).encode()
+            if prefix + len(body) <= start:
+                break
+            start = _align(prefix + len(body))
+        body = body.ljust(start - prefix)
+
+        with open(path, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(body)) + body)
+            for k, v in topology.items():
+                f.seek(entries[k]["offset"])
+                f.write(v.tobytes())
+            f.truncate(header["frame_offset"])
+        return cls(path, header, "w")
+
+    @classmethod
+    def open(cls, path, mode: str = "r") -> "ResultStore":
+        """
+        :param mode: "r" to read, "a" to append frames
+        """
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path!r} is not a result store")
+            (size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(size))
+        return cls(path, header, "w" if mode == "a" else "r")
+
+    def append(self, time: float, **values):
+        record = np.zeros(1, dtype=self.dtype)
+        record["time"] = time
+        for k, v in values.items():
+            record[k] = v
+        self._file.write(record.tobytes())
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def truncate(self, n: int):
+        """
+        Keep the first `n` frames only
+        """
+        self.flush()
+        os.truncate(self.path, self.header["frame_offset"] + n * self.dtype.itemsize)
+        self._mm, self._mm_frames = None, -1
+
+    def drop(self, n: int):
+        """
+        Remove the first `n` frames, the file is rewritten
+        """
+        total = len(self)
+        n = min(n, total)
+        offset, size = self.header["frame_offset"], self.dtype.itemsize
+        tmp = f"{self.path}.tmp"
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            dst.write(src.read(offset))
+            src.seek(offset + n * size)
+            shutil.copyfileobj(src, dst)
+            dst.truncate(offset + (total - n) * size)  # incomplete frame
+        os.replace(tmp, self.path)
+        if self._file is not None:
+            self._file.close()
+            self._file = open(self.path, "ab")
+        self._mm, self._mm_frames = None, -1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        self.flush()
+        size = os.path.getsize(self.path) - self.header["frame_offset"]
+        return size // self.dtype.itemsize
+
+    @property
+    def fields(self):
+        return [k for k, _, _ in self.header["fields"]]
+
+    def frames(self) -> np.ndarray:
+        """
+        Structured memory map of every complete frame
+        """
+        n = len(self)
+        if n != self._mm_frames:
+            self._mm = np.memmap(
+                self.path,
+                dtype=self.dtype,
+                mode="r",
+                offset=self.header["frame_offset"],
+                shape=(n,),
+            )
+            self._mm_frames = n
+        return self._mm
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """
+        View of one field (or "time") over all frames
+        """
+        return self.frames()[name]
+
+    def frame(self, i: int) -> Dict[str, np.ndarray]:
+        rec = self.frames()[i]
+        return {k: rec[k] for k in self.dtype.names}
+
+    def topology(self, name: str) -> np.ndarray:
+        e = self.header["topology"][name]
+        return np.memmap(
+            self.path,
+            dtype=e["dtype"],
+            mode="r",
+            offset=e["offset"],
+            shape=tuple(e["shape"]),
+        )
+
+    def to_vtk(
+        self,
+        pattern: str,
+        frames: Optional[Iterable[int]] = None,
+        points: str = "position",
+        cells: str = "tetrahedra",
+        fields: Optional[Iterable[str]] = None,
+    ):
+        """
+        Write legacy ASCII .vtk files for the selected frames
+        :param pattern: output path with a `{i}` frame placeholder
+        :param points: field (or topology array) giving the node positions
+        """
+        frames = range(len(self)) if frames is None else frames
+        topo = self.header["topology"]
+        conn = np.asarray(self.topology(cells))
+        npc, cell_type = VTK_CELL_TYPES[cells]
+        fields = [f for f in (fields or self.fields) if f != points]
+
+        for i in frames:
+            rec = self.frames()[i]
+            x = self.topology(points) if points in topo else rec[points]
+            n = len(x)
+            lines = [
+                "# vtk DataFile Version 3.0",
+                f"frame {i} t={rec['time']}",
+                "ASCII",
+                "DATASET UNSTRUCTURED_GRID",
+                f"POINTS {n} double",
+                *_rows(x),
+                f"CELLS {len(conn)} {len(conn) * (npc + 1)}",
+                *(f"{npc} " + " ".join(map(str, c)) for c in conn),
+                f"CELL_TYPES {len(conn)}",
+                *([str(cell_type)] * len(conn)),
+            ]
+            data = [f for f in fields if rec[f].shape[:1] == (n,)]
+            if data:
+                lines.append(f"POINT_DATA {n}")
+            for f in data:
+                v = np.asarray(rec[f], dtype=float).reshape(n, -1)
+                if v.shape[1] == 3:
+                    lines.append(f"VECTORS {f} double")
+                else:
+                    lines.append(f"SCALARS {f} double {v.shape[1]}")
+                    lines.append("LOOKUP_TABLE default")
+                lines += _rows(v)
+
+            with open(pattern.format(i=i), "w") as fh:
+                fh.write("\n".join(lines) + "\n")
+
+
+log = logging.getLogger(__name__)
@@ -0,0 +1,326 @@
+import argparse
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing as mp
+import os
+import signal
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional, Type, Union
+
+import treefiles as tf
+
+from SofaModel.base_model import BaseModel, BaseScene
+from SofaModel.registry import RunRegistry
+
+
+def grid(**axes) -> List[dict]:
+    """
+    Cartesian product of parameter values: grid(costa_a=[1, 2], costa_k=[3, 4])
+    """
+    keys = list(axes)
+    return [dict(zip(keys, v)) for v in itertools.product(*axes.values())]
+
+
+def load_class(path: str):
+    """
+    Import a class from a "package.module:ClassName" string
+    """
+    module, _, name = path.partition(":")
+    obj = importlib.import_module(module)
+    for part in name.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def class_path(cls) -> str:
+    if isinstance(cls, str):
+        return cls
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def run_one(job: dict) -> dict:
+    """
+    Worker entry point, build the model of one variant and run it in batch mode
+    """
+    if job.get("marker"):  # tells Sweep.run which worker ran it if one dies
+        with open(job["marker"], "w") as f:
+            f.write(str(os.getpid()))
+    model_cls, scene_cls = job["model"], job["scene"]
+    if isinstance(model_cls, str):
+        model_cls = load_class(model_cls)
+    if isinstance(scene_cls, str):
+        scene_cls = load_class(scene_cls)
+
+    row = {
+        "name": job["name"],
+        "out_dir": job["out_dir"],
+        "variant": job["variant"],
+        "host": os.uname().nodename,
+        "pid": os.getpid(),
+    }
+    start = time.perf_counter()
+    try:
+        params = tf.Params.from_dict(job["params"])
+        for k, v in job["variant"].items():
+            params.add(k, v)
+        params.add("out_dir", job["out_dir"])
+
+        model = model_cls(params, scene_cls())
+        registry = job["registry"] and RunRegistry(job["registry"])
+        entry = model.run(
+            std_to_file=job["std_to_file"], registry=registry, force=job["force"]
+        )
+        if entry is not None and entry.get("cached"):
+            row["status"] = "cached"
+            row["out_dir"] = entry["out_dir"]
+        else:
+            row["status"] = "done"
+        row["stop"] = tf.load_json(os.path.join(row["out_dir"], "stop.json"))["reason"]
+    except BaseException as e:
+        row["status"] = "failed"
+        row["error"] = f"{type(e).__name__}: {e}"
+        row["traceback"] = traceback.format_exc()
+    row["wall"] = time.perf_counter() - start
+    return row
+
+
+def _culprits(broken: List[dict], workers: dict) -> List[dict]:
+    """
+    Jobs of a broken pool whose worker died on its own, the others being
+    terminated by the pool. Falls back to the started jobs, then to all of them,
+    when the dead worker is unknown
+    """
+    for p in workers.values():
+        p.join()
+    dead = {
+        pid for pid, p in workers.items() if p.exitcode not in (0, -signal.SIGTERM)
+    }
+    pids = {}
+    for job in broken:
+        try:
+            with open(job["marker"]) as f:
+                pids[job["name"]] = int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            continue
+    culprits = [j for j in broken if pids.get(j["name"]) in dead]
+    return culprits or [j for j in broken if j["name"] in pids] or broken
+
+
+class Sweep:
+    """
+    Run one simulation per parameter variant in a bounded pool of spawned processes
+    """
+
+    def __init__(
+        self,
+        model: Union[str, Type[BaseModel]],
+        scene: Union[str, Type[BaseScene]],
+        params: tf.Params,
+        variants: Iterable[dict],
+        out: str,
+        workers: Optional[int] = None,
+        std_to_file: bool = True,
+        tasks_per_worker: Optional[int] = None,
+        retries: int = 1,
+        registry: Optional[str] = None,
+        force: bool = False,
+    ):
+        self.model = model
+        self.scene = scene
+        self.params = params if isinstance(params, tf.Params) else tf.Params(params)
+        self.variants = list(variants)
+        self.out = tf.dump(out)
+        self.workers = workers or os.cpu_count()
+        self.std_to_file = std_to_file
+        self.tasks_per_worker = tasks_per_worker
+        self.retries = retries
+        self.registry = registry
+        self.force = force
+        self.results: List[dict] = []
+
+    def jobs(self) -> List[dict]:
+        base = self.params.to_dict()
+        width = len(str(max(len(self.variants) - 1, 0)))
+        jobs = []
+        for i, variant in enumerate(self.variants):
+            name = f"run_{i:0{width}d}"
+            jobs.append(
+                {
+                    "name": name,
+                    "model": self.model,
+                    "scene": self.scene,
+                    "params": base,
+                    "variant": variant,
+                    "out_dir": str(tf.dump(self.out / name).abs()),
+                    "std_to_file": self.std_to_file,
+                    "registry": self.registry,
+                    "force": self.force,
+                    "marker": None,
+                }
+            )
+        return jobs
+
+    @tf.timer
+    def run(self) -> List[dict]:
+        jobs = self.jobs()
+        markers = tf.dump(self.out / ".started")
+        for job in jobs:
+            job["marker"] = os.path.join(str(markers), job["name"])
+        todo = list(jobs)
+        attempts: Dict[str, int] = {}
+        rows = {}
+        log.info(f"Starting sweep of {len(todo)} runs on {self.workers} workers")
+
+        # A worker killed by SOFA (segfault, OOM) breaks the whole pool, so the
+        # unfinished jobs are resubmitted to a fresh pool. Only the job of the
+        # dead worker is charged an attempt, the others were innocent bystanders
+        while todo:
+            for job in todo:
+                if os.path.exists(job["marker"]):
+                    os.remove(job["marker"])
+            broken = []
+            workers = {}
+            with ProcessPoolExecutor(
+                max_workers=min(self.workers, len(todo)),
+                mp_context=mp.get_context("spawn"),
+                max_tasks_per_child=self.tasks_per_worker,
+            ) as pool:
+                futures = {pool.submit(run_one, job): job for job in todo}
+                for fut in as_completed(futures):
+                    job = futures[fut]
+                    workers.update(pool._processes or {})
+                    try:
+                        row = fut.result()
+                    except BrokenProcessPool:
+                        broken.append(job)
+                        continue
+                    rows[job["name"]] = row
+                    log.info(f"{row['name']}: {row['status']} in {row['wall']:.1f}s")
+
+            todo = []
+            culprits = _culprits(broken, workers)
+            for job in broken:
+                if job not in culprits:
+                    todo.append(job)
+                    continue
+                attempts[job["name"]] = attempts.get(job["name"], 0) + 1
+                if attempts[job["name"]] > self.retries:
+                    rows[job["name"]] = {
+                        "name": job["name"],
+                        "out_dir": job["out_dir"],
+                        "variant": job["variant"],
+                        "status": "crashed",
+                        "error": "worker process died",
+                        "wall": float("nan"),
+                    }
+                else:
+                    todo.append(job)
+
+        self.results = [rows[job["name"]] for job in jobs]
+        tf.dump_json(self.out / "sweep.json", self.results, cls=tf.JsonEncoder)
+        log.info(f"Sweep summary:\n{self.table()}")
+        return self.results
+
+    def submit(self, queue) -> List[str]:
+        """
+        Hand the runs to a JobQueue instead of running them here
+        """
+        jobs = self.jobs()
+        for job in jobs:
+            job["model"] = class_path(job["model"])
+            job["scene"] = class_path(job["scene"])
+        ids = queue.submit(jobs)
+        log.info(f"Submitted {len(ids)} runs to file://{queue.root}")
+        return ids
+
+    def table(self) -> str:
+        keys = sorted({k for r in self.results for k in r["variant"]})
+        header = ["name", "status", "wall (s)", *keys, "stop", "error"]
+        lines = [
+            [
+                r["name"],
+                r["status"],
+                f"{r['wall']:.1f}",
+                *(str(r["variant"].get(k, "")) for k in keys),
+                r.get("stop", ""),
+                r.get("error", ""),
+            ]
+            for r in self.results
+        ]
+        widths = [max(len(x) for x in col) for col in zip(header, *lines)]
+        fmt = lambda row: "  ".join(x.ljust(w) for x, w in zip(row, widths))
+        sep = "  ".join("-" * w for w in widths)
+
+        n_ok = sum(r["status"] in ("done", "cached") for r in self.results)
+        footer = f"{n_ok}/{len(self.results)} runs done"
+        return "\n".join([fmt(header), sep, *map(fmt, lines), sep, footer])
+
+
+def _parse_axis(text: str):
+    name, _, values = text.partition("=")
+    return name, [json.loads(v) for v in values.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a SOFA parameter sweep")
+    parser.add_argument("model", help="BaseModel subclass, 'module:Class'")
+    parser.add_argument("scene", help="BaseScene subclass, 'module:Class'")
+    parser.add_argument("params", help="Base params.json")
+    parser.add_argument("out", help="Sweep output directory")
+    parser.add_argument(
+        "--grid",
+        action="append",
+        default=[],
+        metavar="NAME=V1,V2,...",
+        help="Grid axis, values are parsed as json",
+    )
+    parser.add_argument(
+        "--samples", help="Json file holding a list of {name: value} variants"
+    )
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--tasks-per-worker", type=int, default=None)
+    parser.add_argument("--no-std-to-file", action="store_true")
+    parser.add_argument("--registry", help="Skip runs completed in this registry")
+    parser.add_argument("--force", action="store_true", help="Ignore the registry")
+    parser.add_argument(
+        "--queue", help="Submit the runs to this JobQueue directory instead"
+    )
+    args = parser.parse_args(argv)
+
+    variants = grid(**dict(map(_parse_axis, args.grid))) if args.grid else []
+    if args.samples:
+        variants.extend(tf.load_json(args.samples))
+    if not variants:
+        parser.error("Provide at least one --grid axis or --samples")
+
+    sweep = Sweep(
+        args.model,
+        args.scene,
+        tf.Params.from_dict(tf.load_json(args.params)),
+        variants,
+        args.out,
+        workers=args.workers,
+        std_to_file=not args.no_std_to_file,
+        tasks_per_worker=args.tasks_per_worker,
+        registry=args.registry,
+        force=args.force,
+    )
+    if args.queue:
+        from SofaModel.jobqueue import JobQueue
+
+        sweep.submit(JobQueue(args.queue))
+        return 0
+    results = sweep.run()
+    return 0 if all(r["status"] in ("done", "cached") for r in results) else 1
+
+
+log = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
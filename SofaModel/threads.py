@@ -0,0 +1,108 @@
+import logging
+import os
+import sys
+
+PLUGIN = "MultiThreading"
+
+# Parallel variant of each component type in the MultiThreading plugin
+PARALLEL_VARIANTS = {
+    "TetrahedronFEMForceField": "ParallelTetrahedronFEMForceField",
+    "HexahedronFEMForceField": "ParallelHexahedronFEMForceField",
+    "SpringForceField": "ParallelSpringForceField",
+    "MeshSpringForceField": "ParallelMeshSpringForceField",
+    "StiffSpringForceField": "ParallelStiffSpringForceField",
+    "BVHNarrowPhase": "ParallelBVHNarrowPhase",
+    "BruteForceBroadPhase": "ParallelBruteForceBroadPhase",
+}
+
+# Environment read by the BLAS/OpenMP runtimes of the plugins when loaded
+THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def threads_param(params) -> int:
+    """
+    Number of threads of a run, the optional `threads` parameter
+    """
+    return int(params["threads"].value) if "threads" in params else 1
+
+
+def set_thread_env(threads: int):
+    """
+    Thread counts of the BLAS/OpenMP runtimes, only read when SOFA and its
+    plugins are loaded: set it before `load_sofa`
+    """
+    if "Sofa.Core" in sys.modules and any(
+        os.environ.get(k) != str(threads) for k in THREAD_ENV
+    ):
+        log.warning(
+            f"SOFA is already loaded, {', '.join(THREAD_ENV)} stay at "
+            f"{os.environ.get(THREAD_ENV[0], 'their default')} instead of {threads}"
+        )
+    for k in THREAD_ENV:
+        os.environ.setdefault(k, str(threads))
+
+
+class ParallelNode:
+    """
+    Proxy of a SOFA (or recording) node used by the scenes of multi-threaded
+    runs: components with a parallel variant are replaced by it, using
+    `threads` threads of the task scheduler when the variant has a nbThreads
+    Data (the plain component is kept if the variant cannot be created), and
+    with `parallel_ode` the
+    animation loop solves the ODEs of independent subgraphs concurrently.
+    Anything else is forwarded to the node
+    """
+
+    def __init__(self, node, threads: int, parallel_ode: bool = False, top=True):
+        self.__dict__["node"] = node
+        self.__dict__["threads"] = threads
+        self.__dict__["parallel_ode"] = parallel_ode
+        self.__dict__["loop"] = None
+        if top:
+            node.addObject("RequiredPlugin", pluginName=PLUGIN)
+            if parallel_ode:
+                self.__dict__["loop"] = node.addObject(
+                    "DefaultAnimationLoop", parallelODESolving=True
+                )
+
+    def addObject(self, type_name, **kwargs):
+        if isinstance(type_name, str):
+            if type_name in PARALLEL_VARIANTS:
+                return self._parallel(type_name, kwargs)
+            elif type_name == "DefaultAnimationLoop" and self.loop is not None:
+                for k, v in kwargs.items():  # already added, see __init__
+                    if self.loop.findData(k) is not None:
+                        self.loop.findData(k).value = v
+                return self.loop
+            elif type_name.endswith("AnimationLoop") and self.loop is not None:
+                raise ValueError(
+                    f"{type_name} added, parallel_ode requires DefaultAnimationLoop"
+                )
+        return self.node.addObject(type_name, **kwargs)
+
+    def _parallel(self, type_name, kwargs):
+        try:
+            obj = self.node.addObject(PARALLEL_VARIANTS[type_name], **kwargs)
+        except Exception as e:  # plugin built without this variant
+            log.warning(f"{PARALLEL_VARIANTS[type_name]} unavailable ({e})")
+            return self.node.addObject(type_name, **kwargs)
+        d = obj.findData("nbThreads")
+        if d is not None and "nbThreads" not in kwargs:
+            d.value = self.threads
+        return obj
+
+    def addChild(self, name):
+        child = self.node.addChild(name)
+        return ParallelNode(child, self.threads, top=False)
+
+    def __getattr__(self, name):
+        return getattr(self.node, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.node, name, value)
+
+    def __getitem__(self, path):
+        return self.node[path]
+
+
+log = logging.getLogger(__name__)
@@ -1,55 +1,27 @@
 import io
 import logging
+import time
 from datetime import datetime
-from typing import Type, Optional
+from typing import Type, Optional, Set
 
 import treefiles as tf
 
 from basesofamodel.load_SOFA import load_SOFA
 
-load_SOFA()
-from Sofa import Simulation
-from Sofa.Core import Node, Controller
-from Sofa.Gui import GUIManager
-from SofaRuntime.SofaRuntime import importPlugin
 
+def __getattr__(name):
+    # SOFAControl subclasses Sofa.Core.Controller, import SOFA only when needed
+    if name == "SOFAControl":
+        from basesofamodel.sofa_deps import SOFAControl
 
-class SOFAControl(Controller):
-    def __init__(self, root, **kw):
-        super().__init__(**kw)
-        self.root = root
-        self.data = []
-        self.out = kw.pop("out", None)
-
-    def export(self):
-        pass
-
-    def onAnimateBeginEvent(self, event):
-        if self.root.time.value == 0:
-            self.export()
-
-    def onAnimateEndEvent(self, event):
-        self.export()
-
-    def get(self, path, data):
-        try:
-            obj = self.root[path].findData(data).value
-        except:
-            return
-        return obj
-
-    def set(self, path, data, value):
-        try:
-            self.root[path].findData(data).value = value
-        except:
-            return
-
-    # def onAnimateEndEvent(self, event):
-    #     V = self.root["APIVersion"].findData("level").value
-    #     print("onAnimateBeginEvent", event, V)
+        return SOFAControl
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class BaseScene:
+    # Plugins imported for this scene instead of the model's PLUGINS set
+    PLUGINS: Optional[Set[str]] = None
+
     def __init__(self, root, params):
         self.ra = lambda x: params[x].value
         self.root = root
@@ -57,7 +29,7 @@ class BaseScene:
         self.root.findData("gravity").value = [0, 0, 0]
         self.root.addObject("APIVersion", level="21.12.00")
 
-        self.controller: Optional[SOFAControl] = None
+        self.controller: Optional["SOFAControl"] = None
 
     def init(self):
         pass
@@ -94,6 +66,7 @@ class BaseModel:
         self.root = None
         self.scene_class = scene_class
         self.scene: Optional[BaseScene] = None
+        self.timings = {}
 
         if "n" not in self.params:
             log.warning("Iteration number not set, defaulting to n=10")
@@ -119,18 +92,44 @@ class BaseModel:
         """
         graph: create_graph(root: Node, params: tf.TParams)
         """
-        for x in self.plugins:
+        self.load_sofa()
+        from Sofa import Simulation
+        from Sofa.Core import Node
+        from SofaRuntime.SofaRuntime import importPlugin
+
+        plugins = self.scene_class.PLUGINS
+        if plugins is None:
+            plugins = self.plugins
+        t = time.perf_counter()
+        for x in plugins:
             importPlugin(x)
+        self.timings["plugins"] = time.perf_counter() - t
+        log.info(
+            f"{len(plugins)} plugins imported in {self.timings['plugins']:.2f}s"
+        )
 
         self.root = Node("root")
         self.scene = self.scene_class(self.root, self.params)
         self.scene.init()
         Simulation.init(self.root)
 
+    def load_sofa(self):
+        if "sofa" in self.timings:
+            return
+        t = time.perf_counter()
+        load_SOFA()
+        import Sofa.Core
+        import Sofa.Simulation
+
+        self.timings["sofa"] = time.perf_counter() - t
+        log.info(f"SOFA imported in {self.timings['sofa']:.2f}s")
+
     def set_data_path(self):
         pass
 
     def print_scene(self):
+        from Sofa import Simulation
+
         Simulation.print(self.root)
 
     def init(self):
@@ -138,7 +137,12 @@ class BaseModel:
 
     @tf.timer
     def run(self, gui: bool = False, std_to_file: bool = False):
+        self.load_sofa()
+        from Sofa import Simulation
+
         if gui:
+            from Sofa.Gui import GUIManager
+
             self.init_scene()
             GUIManager.Init("")
             GUIManager.createGUI(self.root, __file__)
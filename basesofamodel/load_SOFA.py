@@ -1,7 +1,14 @@
+_loaded = False
+
+
 def load_SOFA():
+    global _loaded
     import os
     import sys
 
+    if _loaded:
+        return
+
     sofa_build = os.environ.get("SOFA_ROOT")
     if not sofa_build:
         sofa_build = "/home/gdesrues/Documents/sofa/v21.12/build_clion"
@@ -12,5 +19,6 @@ def load_SOFA():
     sys.path.insert(0, f"{sofa_build}/lib/python3/site-packages")
     os.environ["SOFA_ROOT"] = sofa_build
     os.environ["SOFAPYTHON3_ROOT"] = sofa_build
+    _loaded = True
 
     print(f"--> Found SOFA: {sofa_build!r}")
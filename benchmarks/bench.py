@@ -0,0 +1,257 @@
+"""
+Benchmarks of the Python side of SofaModel: import time, init_scene time,
+per-step time, export overhead and peak memory on tetrahedral meshes of
+increasing size, each case in a fresh process.
+
+Without SOFA_ROOT the fake backend of benchmarks/fake_sofa is used, which
+measures the Python overhead only:
+    python benchmarks/bench.py -o bench.json
+    python benchmarks/bench.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import treefiles as tf
+
+from SofaModel import BaseModel, BaseScene
+from SofaModel.hooks import RunHook
+
+METRICS = (
+    "import_s",
+    "sofa_import_s",
+    "init_scene_s",
+    "step_ms",
+    "export_step_ms",
+    "peak_rss_mb",
+    "peak_python_mb",
+)
+
+
+def tetra_grid(res: int):
+    """
+    Unit cube split in res^3 cells of 6 tetrahedra
+    """
+    g = np.linspace(0, 1, res + 1)
+    points = np.stack(np.meshgrid(g, g, g, indexing="ij"), -1).reshape(-1, 3)
+    idx = np.arange((res + 1) ** 3).reshape(res + 1, res + 1, res + 1)
+    c = [
+        idx[i : i + res, j : j + res, k : k + res].ravel()
+        for i in (0, 1)
+        for j in (0, 1)
+        for k in (0, 1)
+    ]
+    # corners c[ijk] with ijk in binary, Kuhn subdivision along the 0-7 diagonal
+    paths = [(1, 3), (1, 5), (2, 3), (2, 6), (4, 5), (4, 6)]
+    tetra = np.concatenate(
+        [np.stack([c[0], c[a], c[b], c[7]], -1) for a, b in paths]
+    )
+    return points, tetra
+
+
+def write_vtk(path, points, tetra):
+    with open(path, "w") as f:
+        f.write("# vtk DataFile Version 3.0\nbench\nASCII\nDATASET UNSTRUCTURED_GRID\n")
+        f.write(f"POINTS {len(points)} double\n")
+        np.savetxt(f, points, fmt="%.6g")
+        f.write(f"CELLS {len(tetra)} {5 * len(tetra)}\n")
+        np.savetxt(f, np.hstack([np.full((len(tetra), 1), 4), tetra]), fmt="%d")
+        f.write(f"CELL_TYPES {len(tetra)}\n")
+        np.savetxt(f, np.full(len(tetra), 10), fmt="%d")
+
+
+class BenchScene(BaseScene):
+    def init(self):
+        r = self.root
+        r.addObject("DefaultAnimationLoop")
+        r.addObject("MeshVTKLoader", name="loader", filename=self.ra("mesh"))
+
+        meca = r.addChild("meca")
+        meca.addObject("EulerImplicitSolver", name="solver")
+        meca.addObject("CGLinearSolver", name="cg", iterations=25, tolerance=1e-9)
+        meca.addObject(
+            "TetrahedronSetTopologyContainer",
+            name="topo",
+            tetrahedra="@../loader.tetrahedra",
+        )
+        meca.addObject("MechanicalObject", name="dofs", position="@../loader.position")
+        meca.addObject("TetrahedronFEMForceField", name="fem", youngModulus=1e3)
+        meca.addObject("DiagonalMass", name="mass")
+
+        if self.ra("export"):
+            from SofaModel.sofa_deps import StoreExporter
+
+            self.controller = StoreExporter(
+                r,
+                path=os.path.join(str(self.ra("out_dir")), "results.bin"),
+                fields={"position": ("meca/dofs", "position")},
+                topology={"tetrahedra": ("meca/topo", "tetrahedra")},
+            )
+            r.addObject(self.controller)
+
+
+class BenchModel(BaseModel):
+    PLUGIN_MODE = "auto"
+
+
+class StepTimer(RunHook):
+    def __init__(self):
+        self.times = []
+        self._t = None
+
+    def before_step(self, model):
+        self._t = time.perf_counter()
+
+    def after_step(self, model):
+        self.times.append(time.perf_counter() - self._t)
+
+
+def _params(out, mesh, steps, export):
+    params = tf.Params()
+    params.add("out_dir", out)
+    params.add("n", steps)
+    params.add("dt", 1e-3)
+    params.add("mesh", mesh)
+    params.add("export", export)
+    return params
+
+
+def _run(out, mesh, steps, export):
+    model = BenchModel(_params(out, mesh, steps, export), BenchScene())
+    timer = StepTimer()
+    model.hooks.append(timer)
+    model.run()
+    return model, np.array(timer.times[1:] or timer.times)  # skip warm-up
+
+
+def bench_case(res: int, steps: int, out: str) -> dict:
+    logging.disable(logging.INFO)
+    points, tetra = tetra_grid(res)
+    out = str(tf.dump(os.path.join(out, f"res_{res}")))
+    mesh = os.path.join(out, "mesh.vtk")
+    write_vtk(mesh, points, tetra)
+
+    tracemalloc.start()
+    model, plain = _run(os.path.join(out, "plain"), mesh, steps, False)
+    _, export = _run(os.path.join(out, "export"), mesh, steps, True)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "res": res,
+        "nodes": len(points),
+        "tetrahedra": len(tetra),
+        "steps": steps,
+        "init_scene_s": model.timings["init_scene"],
+        "step_ms": 1e3 * float(np.median(plain)),
+        "step_ms_p95": 1e3 * float(np.percentile(plain, 95)),
+        "export_step_ms": 1e3 * float(np.median(export)),
+        "export_overhead_ms": 1e3 * float(np.median(export) - np.median(plain)),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_python_mb": peak / 2**20,
+    }
+
+
+def import_times() -> dict:
+    code = (
+        "import time; t = time.perf_counter(); import SofaModel; "
+        "t1 = time.perf_counter(); from SofaModel.load_SOFA import load_SOFA; "
+        "load_SOFA(); import Sofa.Core, Sofa.Simulation; "
+        "print(t1 - t, time.perf_counter() - t1)"
+    )
+    res = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(HERE),
+    )
+    a, b = map(float, res.stdout.split()[-2:])
+    return {"import_s": a, "sofa_import_s": b}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    base = {c["nodes"]: c for c in baseline["cases"]}
+    ok = True
+    print(f"{'nodes':>8} {'metric':<16} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for case in results["cases"]:
+        ref = base.get(case["nodes"])
+        if ref is None:
+            continue
+        for m in METRICS:
+            if m not in case or m not in ref or not ref[m]:
+                continue
+            ratio = case[m] / ref[m]
+            flag = ""
+            if ratio > 1 + tolerance:
+                flag, ok = " REGRESSION", False
+            print(
+                f"{case['nodes']:>8} {m:<16} {ref[m]:>10.4g} {case[m]:>10.4g} "
+                f"{ratio:>7.2f}{flag}"
+            )
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--res", type=int, nargs="+", default=[4, 8, 16, 24])
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--out", default=os.path.join(HERE, "out"))
+    parser.add_argument("-o", "--output", default="bench.json")
+    parser.add_argument("--baseline", help="Compare with this results file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    if not os.environ.get("SOFA_ROOT"):
+        os.environ["SOFA_ROOT"] = os.path.join(HERE, "fake_sofa")
+    backend = "fake" if "fake_sofa" in os.environ["SOFA_ROOT"] else "sofa"
+
+    results = {
+        "backend": backend,
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        **import_times(),
+        "cases": [],
+    }
+    ctx = mp.get_context("spawn")
+    for res in args.res:
+        with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            case = pool.submit(bench_case, res, args.steps, args.out).result()
+        case["import_s"] = results["import_s"]
+        case["sofa_import_s"] = results["sofa_import_s"]
+        results["cases"].append(case)
+        print(
+            f"{case['nodes']:>8} nodes: init {case['init_scene_s']:.3f}s, "
+            f"step {case['step_ms']:.2f}ms (+{case['export_overhead_ms']:.2f}ms "
+            f"export), peak {case['peak_rss_mb']:.0f}MB"
+        )
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("backend") != backend:
+            print(f"Baseline was measured with the {baseline.get('backend')} backend")
+        return 0 if compare(results, baseline, args.tolerance) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class Data:
+    def __init__(self, value=None):
+        self._value = self._convert(value)
+
+    @staticmethod
+    def _convert(value):
+        if isinstance(value, (list, tuple)) or isinstance(value, np.ndarray):
+            return np.array(value)
+        return value
+
+    @property
+    def value(self):
+        if isinstance(self._value, np.ndarray):
+            return self._value.copy()  # like SofaPython3, .value copies
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = self._convert(value)
+
+    def array(self):
+        view = self._value.view()
+        view.flags.writeable = False
+        return view
+
+    @contextmanager
+    def writeableArray(self):
+        yield self._value
+
+
+class _Base:
+    def _init_data(self):
+        self.__dict__["_data"] = {}
+
+    def findData(self, name):
+        return self._data.get(name)
+
+    def addData(self, name, value=None):
+        self._data[name] = Data(value)
+        return self._data[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in self.__dict__.get("_data", {}):
+            raise AttributeError(name)
+        return self._data[name]
+
+
+class BaseObject(_Base):
+    def __init__(self, type_name, node, **kwargs):
+        self._init_data()
+        self.__dict__["_type"] = type_name
+        self.__dict__["_node"] = node
+        self.addData("name", kwargs.pop("name", type_name))
+        for k, v in kwargs.items():
+            self.addData(k, v)
+
+    def getClassName(self):
+        return self._type
+
+    def getPathName(self):
+        return f"{self._node.getPathName().rstrip('/')}/{self.name.value}"
+
+    def getContext(self):
+        return self._node
+
+    def link(self, value):
+        """
+        Resolve "@path/to/object.data" relative to the owner node
+        """
+        path = value[1:]
+        obj_path, sep, data = path.rpartition(".")
+        if not sep or "/" in data:  # link to an object
+            return self._node[path]
+        return self._node[obj_path].findData(data).value
+
+    def init(self):
+        for k, d in list(self._data.items()):
+            if isinstance(d._value, str) and d._value.startswith("@"):
+                try:
+                    target = self.link(d._value)
+                except (KeyError, AttributeError):
+                    continue
+                if not isinstance(target, (BaseObject, Node)):
+                    d.value = target
+
+
+class Controller(_Base):
+    def __init__(self, *args, **kwargs):
+        self._init_data()
+        self.addData("name", kwargs.get("name", type(self).__name__))
+        self.addData("listening", True)
+        self.__dict__["_node"] = None
+
+    def getClassName(self):
+        return type(self).__name__
+
+    def getPathName(self):
+        return f"{self._node.getPathName().rstrip('/')}/{self.name.value}"
+
+    def init(self):
+        pass
+
+
+class Node(_Base):
+    def __init__(self, name="root", parent=None):
+        self._init_data()
+        self.__dict__["parent"] = parent
+        self.__dict__["objects"] = []
+        self.__dict__["children"] = []
+        self.addData("name", name)
+        self.addData("dt", 0.01)
+        self.addData("time", 0.0)
+        self.addData("gravity", [0, -9.81, 0])
+        self.addData("activated", True)
+
+    def addObject(self, type_name, **kwargs):
+        from Sofa.components import make
+
+        if isinstance(type_name, Controller):
+            type_name.__dict__["_node"] = self
+            self.objects.append(type_name)
+            return type_name
+        obj = make(type_name, self, **kwargs)
+        self.objects.append(obj)
+        return obj
+
+    def addChild(self, name):
+        child = Node(name, self)
+        self.children.append(child)
+        return child
+
+    def getPathName(self):
+        if self.parent is None:
+            return "/"
+        return f"{self.parent.getPathName().rstrip('/')}/{self.name.value}"
+
+    def getRoot(self):
+        return self if self.parent is None else self.parent.getRoot()
+
+    def __getitem__(self, path):
+        node = self
+        if path.startswith("/"):
+            node, path = self.getRoot(), path[1:]
+        for part in path.split("/"):
+            if part in ("", "."):
+                continue
+            if part == "..":
+                node = node.parent
+                continue
+            match = [c for c in node.children if c.name.value == part]
+            match += [o for o in node.objects if o.name.value == part]
+            if not match:
+                raise KeyError(path)
+            node = match[0]
+        return node
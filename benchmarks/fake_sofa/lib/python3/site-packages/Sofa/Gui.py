@@ -0,0 +1,4 @@
+class GUIManager:
+    @staticmethod
+    def Init(*args):
+        raise RuntimeError("The fake SOFA backend has no GUI")
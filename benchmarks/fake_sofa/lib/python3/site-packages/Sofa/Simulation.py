@@ -0,0 +1,67 @@
+import builtins
+import time
+
+from Sofa import Timer
+from Sofa.Core import Controller
+
+
+def _walk(node):
+    yield node
+    for c in node.children:
+        yield from _walk(c)
+
+
+def _active(node):
+    while node is not None:
+        if not node.activated.value:
+            return False
+        node = node.parent
+    return True
+
+
+def init(root):
+    for node in _walk(root):
+        for obj in list(node.objects):
+            obj.init()
+
+
+def _dispatch(root, event):
+    for node in _walk(root):
+        for obj in node.objects:
+            listening = obj.findData("listening")
+            if listening is not None and not listening.value:
+                continue
+            if isinstance(obj, Controller) and hasattr(obj, event):
+                getattr(obj, event)(None)
+
+
+def animate(root, dt):
+    t0 = time.perf_counter()
+    _dispatch(root, "onAnimateBeginEvent")
+    records = {}
+    for node in _walk(root):
+        if not _active(node):
+            continue
+        for obj in node.objects:
+            if hasattr(obj, "solve"):
+                obj.solve(node, dt, records)
+    root.time.value = root.time.value + dt
+    _dispatch(root, "onAnimateEndEvent")
+
+    if Timer.isEnabled("Animate"):
+        total = (time.perf_counter() - t0) * 1e3
+        Timer._records["Animate"] = {
+            "Animate": {
+                "start_time": 0.0,
+                "total_time": total,
+                **{k: {"total_time": v * 1e3} for k, v in records.items()},
+            }
+        }
+
+
+def print(root, indent=0):
+    builtins.print(" " * indent + root.name.value)
+    for obj in root.objects:
+        builtins.print(" " * (indent + 2) + f"{obj.getClassName()} {obj.name.value}")
+    for c in root.children:
+        print(c, indent + 2)
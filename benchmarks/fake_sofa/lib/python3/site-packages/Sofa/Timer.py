@@ -0,0 +1,30 @@
+_enabled = {}
+_records = {}
+
+
+def setEnabled(timer_id, enabled):
+    _enabled[timer_id] = bool(enabled)
+
+
+def isEnabled(timer_id):
+    return _enabled.get(timer_id, False)
+
+
+def setOutputType(timer_id, output_type):
+    pass
+
+
+def setInterval(timer_id, interval):
+    pass
+
+
+def begin(timer_id):
+    pass
+
+
+def end(timer_id):
+    pass
+
+
+def getRecords(timer_id):
+    return _records.get(timer_id, {})
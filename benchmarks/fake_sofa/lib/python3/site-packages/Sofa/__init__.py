@@ -0,0 +1,5 @@
+"""
+Lightweight stand-in for SofaPython3, enough to run BaseModel scenes without a
+SOFA build: point SOFA_ROOT to benchmarks/fake_sofa. Solvers do a numpy
+workload proportional to the mesh size instead of real mechanics.
+"""
@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+
+from Sofa.Core import BaseObject
+
+
+def _read_vtk(path):
+    """
+    Legacy ASCII unstructured grid: POINTS and CELLS sections
+    """
+    with open(path) as f:
+        tokens = f.read().split()
+    out = {"position": np.zeros((0, 3)), "tetrahedra": np.zeros((0, 4), int)}
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == "POINTS":
+            n = int(tokens[i + 1])
+            values = np.array(tokens[i + 3 : i + 3 + 3 * n], dtype=float)
+            out["position"] = values.reshape(n, 3)
+            i += 3 + 3 * n
+        elif tokens[i] == "CELLS":
+            n, size = int(tokens[i + 1]), int(tokens[i + 2])
+            cells = np.array(tokens[i + 3 : i + 3 + size], dtype=int)
+            if n and size == 5 * n:
+                out["tetrahedra"] = cells.reshape(n, 5)[:, 1:]
+            i += 3 + size
+        else:
+            i += 1
+    return out
+
+
+class MeshVTKLoader(BaseObject):
+    def init(self):
+        super().init()
+        for k, v in _read_vtk(self.filename.value).items():
+            self.addData(k, v)
+
+
+class MechanicalObject(BaseObject):
+    def init(self):
+        super().init()
+        if self.findData("position") is None:
+            src = self.findData("src")
+            x = self.link(f"{src.value}.position") if src else np.zeros((1, 3))
+            self.addData("position", x)
+        x = np.asarray(self.position.value, dtype=float)
+        for k in ("velocity", "force", "rest_position", "free_position"):
+            if self.findData(k) is None:
+                self.addData(k, x.copy() if k == "rest_position" else np.zeros_like(x))
+
+
+class TetrahedronFEMForceField(BaseObject):
+    def add_force(self, mo, f):
+        topo = [o for o in self._node.objects if o.findData("tetrahedra") is not None]
+        tetra = np.asarray(topo[0].tetrahedra.value, dtype=int) if topo else None
+        x = mo._data["position"]._value
+        u = x - mo._data["rest_position"]._value
+        if tetra is None or not len(tetra):
+            f -= u
+            return
+        strain = u[tetra].mean(axis=1)  # (n_tetra, 3)
+        for k in range(4):
+            np.add.at(f, tetra[:, k], -strain)
+
+
+class ParallelTetrahedronFEMForceField(TetrahedronFEMForceField):
+    """
+    MultiThreading variant, the same single-threaded work here
+    """
+
+    def __init__(self, type_name, node, **kwargs):
+        super().__init__(type_name, node, **kwargs)
+        if self.findData("nbThreads") is None:
+            self.addData("nbThreads", 0)
+
+
+class EulerImplicitSolver(BaseObject):
+    def solve(self, node, dt, records):
+        mos = [o for o in node.objects if isinstance(o, MechanicalObject)]
+        ffs = [o for o in node.objects if hasattr(o, "add_force")]
+        cg = [o for o in node.objects if o.getClassName().endswith("LinearSolver")]
+        iterations = int(cg[0].findData("iterations").value) if cg else 25
+        tol = cg[0].findData("tolerance") if cg else None
+        tol = float(tol.value) if tol is not None else 0.0
+        for mo in mos:
+            x, v = mo._data["position"]._value, mo._data["velocity"]._value
+            f = np.zeros_like(x)
+            for ff in ffs:
+                t = time.perf_counter()
+                ff.add_force(mo, f)
+                label = f"{ff.getClassName()} ({ff.name.value})"
+                records[label] = time.perf_counter() - t
+            t = time.perf_counter()
+            dv = f * dt
+            errors = []
+            for _ in range(min(iterations, 25)):  # matrix-free CG-like work
+                dv = 0.5 * (dv + f * dt)
+                errors.append(float(np.abs(dv - f * dt).max()))
+                if errors[-1] <= tol:
+                    break
+            if cg:  # residuals per iteration, like CGLinearSolver.graph
+                cg[0].addData("graph", {"Error": errors})
+            label = cg[0].getClassName() if cg else "solve"
+            records[label] = time.perf_counter() - t
+            v += dv
+            x += v * dt
+
+
+def make(type_name, node, **kwargs):
+    cls = globals().get(type_name)
+    if not (isinstance(cls, type) and issubclass(cls, BaseObject)):
+        cls = BaseObject
+    return cls(type_name, node, **kwargs)
@@ -0,0 +1,13 @@
+imported = []
+
+
+class PluginRepository:
+    paths = []
+
+    @classmethod
+    def addFirstPath(cls, path):
+        cls.paths.insert(0, str(path))
+
+
+def importPlugin(name):
+    imported.append(name)
@@ -0,0 +1,137 @@
+"""
+Speedup of a scene versus the `threads` parameter, each thread count in a fresh
+process, to choose between threads per run and runs per node:
+    python benchmarks/scaling.py --threads 1 2 4 8
+    python benchmarks/scaling.py --model mod:Model --scene mod:Scene \
+        --params params.json --threads 1 4 16
+Throughput is the number of steps per second of a whole node running as many
+runs as its cores (and memory) allow with that many threads each.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import treefiles as tf
+
+from bench import BenchModel, BenchScene, StepTimer, _params, tetra_grid, write_vtk
+from SofaModel.sweep import load_class
+
+
+def scaling_case(threads: int, job: dict) -> dict:
+    if job["model"]:
+        model_cls, scene_cls = load_class(job["model"]), load_class(job["scene"])
+        params = tf.Params.from_dict(tf.load_json(job["params"]))
+        params.add("n", job["steps"])
+    else:
+        model_cls, scene_cls = BenchModel, BenchScene
+        params = _params(None, job["mesh"], job["steps"], False)
+    params.add("out_dir", str(tf.dump(os.path.join(job["out"], f"threads_{threads}"))))
+    params.add("threads", threads)
+
+    model = model_cls(params, scene_cls())
+    timer = StepTimer()
+    model.hooks.append(timer)
+    model.run()
+    times = np.array(timer.times[1:] or timer.times)
+    return {
+        "threads": threads,
+        "step_ms": 1e3 * float(np.median(times)),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def node_memory_mb() -> float:
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--model", help="BaseModel subclass, 'module:Class'")
+    parser.add_argument("--scene", help="BaseScene subclass, 'module:Class'")
+    parser.add_argument("--params", help="params.json of the model")
+    parser.add_argument("--res", type=int, default=24, help="Grid of the default scene")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--cores", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=os.path.join(HERE, "out", "scaling"))
+    parser.add_argument("-o", "--output", default="scaling.json")
+    args = parser.parse_args(argv)
+    if bool(args.model) != bool(args.scene) or bool(args.model) != bool(args.params):
+        parser.error("--model, --scene and --params go together")
+
+    if not os.environ.get("SOFA_ROOT"):
+        os.environ["SOFA_ROOT"] = os.path.join(HERE, "fake_sofa")
+
+    job = {
+        "model": args.model,
+        "scene": args.scene,
+        "params": args.params,
+        "steps": args.steps,
+        "out": str(tf.dump(args.out)),
+        "mesh": None,
+    }
+    if not args.model:
+        job["mesh"] = os.path.join(job["out"], "mesh.vtk")
+        write_vtk(job["mesh"], *tetra_grid(args.res))
+
+    ctx = mp.get_context("spawn")
+    cases = []
+    for threads in args.threads:
+        with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            cases.append(pool.submit(scaling_case, threads, job).result())
+
+    base = next((c for c in cases if c["threads"] == 1), cases[0])
+    memory = node_memory_mb()
+    for c in cases:
+        c["speedup"] = base["step_ms"] * base["threads"] / c["step_ms"]
+        c["efficiency"] = c["speedup"] / c["threads"]
+        c["runs_per_node"] = max(
+            1, min(args.cores // c["threads"], int(memory // c["peak_rss_mb"]))
+        )
+        c["node_steps_per_s"] = c["runs_per_node"] * 1e3 / c["step_ms"]
+
+    best = max(cases, key=lambda c: c["node_steps_per_s"])
+    print(
+        f"{'threads':>7} {'ms/step':>9} {'speedup':>8} {'eff.':>6} "
+        f"{'runs/node':>9} {'node steps/s':>12}"
+    )
+    for c in cases:
+        print(
+            f"{c['threads']:>7} {c['step_ms']:>9.2f} {c['speedup']:>8.2f} "
+            f"{c['efficiency']:>6.2f} {c['runs_per_node']:>9} "
+            f"{c['node_steps_per_s']:>12.1f}" + (" *" if c is best else "")
+        )
+    print(
+        f"Best throughput on {args.cores} cores: {best['runs_per_node']} runs of "
+        f"{best['threads']} threads"
+    )
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "backend": "fake" if "fake_sofa" in os.environ["SOFA_ROOT"] else "sofa",
+                "cores": args.cores,
+                "memory_mb": memory,
+                "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "cases": cases,
+                "best_threads": best["threads"],
+            },
+            f,
+            indent=2,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
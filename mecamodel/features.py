@@ -0,0 +1,177 @@
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import treefiles as tf
+
+from SofaModel.hooks import RunHook
+from SofaModel.stopping import read
+from mecamodel.monitor import PV_FIELDS
+
+# Ventricle suffix of the pressure/volume entries of PV_FIELDS
+VENTRICLES = ("L", "R")
+
+
+class _Beat:
+    """
+    Running extrema and integrals of one ventricle over one beat
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.v_max = self.v_min = None
+        self.p_max = self.p_min = None
+        self.dpdt_max = -np.inf
+        self.dpdt_min = np.inf
+        self.work = 0.0
+        self._last = None
+
+    def add(self, t: float, p: float, v: float):
+        self.samples += 1
+        if self._last is None:
+            self.v_max = self.v_min = v
+            self.p_max = self.p_min = p
+        else:
+            t0, p0, v0 = self._last
+            self.v_max, self.v_min = max(self.v_max, v), min(self.v_min, v)
+            self.p_max, self.p_min = max(self.p_max, p), min(self.p_min, p)
+            if t > t0:
+                dpdt = (p - p0) / (t - t0)
+                self.dpdt_max = max(self.dpdt_max, dpdt)
+                self.dpdt_min = min(self.dpdt_min, dpdt)
+            self.work -= 0.5 * (p + p0) * (v - v0)  # loop area, ejection is dV < 0
+        self._last = (t, p, v)
+
+    def features(self) -> dict:
+        if not self.samples:
+            return {}
+        sv = self.v_max - self.v_min
+        finite = lambda x: float(x) if np.isfinite(x) else None
+        return {
+            "edv": self.v_max,
+            "esv": self.v_min,
+            "stroke_volume": sv,
+            "ejection_fraction": sv / self.v_max if self.v_max else None,
+            "peak_pressure": self.p_max,
+            "min_pressure": self.p_min,
+            "dpdt_max": finite(self.dpdt_max),
+            "dpdt_min": finite(self.dpdt_min),
+            "stroke_work": self.work,
+            "samples": self.samples,
+        }
+
+
+class PVFeatures(RunHook):
+    """
+    Pressure-volume loop features computed while the model runs, from the
+    pressure and volume Data of the PressureConstraintForceField of each
+    ventricle, so no output file has to be read back afterwards. For every beat
+    of `period`: end-diastolic/systolic volumes, stroke volume, ejection
+    fraction, peak and minimum pressures, dP/dt extrema and stroke work.
+    Writes `features.json` to out_dir, `pv_traces.npz` with `traces`.
+    """
+
+    STATE = ("beats", "beat", "_current", "_trace")
+
+    def __init__(
+        self,
+        period: float,
+        fields: Optional[Dict[str, Tuple[str, str]]] = None,
+        traces: bool = False,
+        every: int = 1,
+    ):
+        self.period = float(period)
+        self.fields = PV_FIELDS if fields is None else fields
+        self.traces = traces
+        self.every = max(1, every)
+        self.beats: List[dict] = []
+        self.beat = None
+        self._current: Dict[str, _Beat] = {}
+        self._trace: List[tuple] = []
+
+    def start(self, model):
+        self.beats = []
+        self.beat = None
+        self._trace = []
+        self.sample(model)
+
+    def after_step(self, model):
+        if model.step % self.every == 0:
+            self.sample(model)
+
+    def sample(self, model):
+        t = model.root.time.value
+        beat = int(t // self.period)
+        if self.beat is None:
+            self._new_beat(beat)
+        elif beat != self.beat:
+            self._close_beat(complete=True)
+            self._new_beat(beat)
+
+        row = [t]
+        for side in VENTRICLES:
+            p = float(np.mean(read(model, *self.fields[f"pressure{side}"])))
+            v = float(np.mean(read(model, *self.fields[f"volume{side}"])))
+            self._current[side].add(t, p, v)
+            row += [p, v]
+        if self.traces:
+            self._trace.append(tuple(row))
+
+    def _new_beat(self, beat: int):
+        self.beat = beat
+        self._current = {side: _Beat() for side in VENTRICLES}
+
+    def _close_beat(self, complete: bool):
+        self.beats.append(
+            {
+                "beat": self.beat,
+                "start": self.beat * self.period,
+                "complete": complete,
+                **{side: b.features() for side, b in self._current.items()},
+            }
+        )
+
+    def last(self) -> Optional[dict]:
+        """
+        Features of the last complete beat
+        """
+        done = [b for b in self.beats if b["complete"]]
+        return done[-1] if done else None
+
+    def finish(self, model):
+        if self.beat is None:
+            return
+        self._close_beat(complete=False)
+        self.beat = None
+
+        out = str(model.params.out_dir.value)
+        tf.dump_json(
+            os.path.join(out, "features.json"),
+            {"period": self.period, "last": self.last(), "beats": self.beats},
+            cls=tf.JsonEncoder,
+        )
+        if self.traces and self._trace:
+            trace = np.array(self._trace)
+            np.savez(
+                os.path.join(out, "pv_traces.npz"),
+                time=trace[:, 0],
+                **{
+                    f"{name}{side}": trace[:, 1 + 2 * i + j]
+                    for i, side in enumerate(VENTRICLES)
+                    for j, name in enumerate(("pressure", "volume"))
+                },
+            )
+        last = self.last()
+        if last is not None:
+            log.info(
+                f"Beat {last['beat']}: EF "
+                + ", ".join(
+                    f"{side} {last[side]['ejection_fraction']:.3f}"
+                    for side in VENTRICLES
+                    if last[side].get("ejection_fraction") is not None
+                )
+            )
+
+
+log = logging.getLogger(__name__)
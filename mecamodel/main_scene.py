@@ -1,16 +1,36 @@
 import logging
 
-from basesofamodel.base_model import BaseScene
+from SofaModel import BaseScene
+from SofaModel.export import ExportConfig, FieldExport
+from mecamodel.monitor import PV_FIELDS
 
 
 class MecaScene(BaseScene):
+    # Legacy plugins of the 21.12 builds, CardiacMeshTools and MechanicalHeart
+    # are loaded by the RequiredPlugin below
+    PLUGINS = {"SofaImplicitOdeSolver", "SofaBoundaryCondition"}
+    # Coupling sub-steps see the mechanics interpolated over the MecaNode step
+    INTERPOLATE = {
+        "Coupling": [("MecaNode/mecaObj", "position"), ("MecaNode/mecaObj", "velocity")]
+    }
+
     def init(self):
+        self.root.addObject("APIVersion", level="21.12.00")
         self.root.addObject("RequiredPlugin", pluginName="CardiacMeshTools")
         self.root.addObject("RequiredPlugin", pluginName="MechanicalHeart")
 
         self.build_meca_node()
         self.build_coupling_node()
 
+    def substeps(self):
+        """
+        COUPLING_SUBSTEPS sub-steps of the cheap contraction coupling ODE per
+        mechanical step of dt
+        """
+        if "COUPLING_SUBSTEPS" in self.params:
+            return {"Coupling": int(self.ra("COUPLING_SUBSTEPS"))}
+        return super().substeps()
+
     def build_meca_node(self):
         node = self.root.addChild("MecaNode")
 
@@ -39,9 +59,9 @@ class MecaScene(BaseScene):
             firstOrder=self.ra("EULER_FIRST_ORDER"),
         )
 
-        node.addObject(
-            "CGLinearSolver",
-            name="linear_solver",
+        self.add_linear_solver(
+            node,
+            "linear_solver",
             iterations="200",
             tags="meca",
             threshold="1e-12",
@@ -223,22 +243,44 @@ class MecaScene(BaseScene):
             tags="meca",
             massDensity=self.ra("MYO_DENSITY"),
         )
-        node.addObject(
-            "CardiacSimulationExporter",
-            Tetras="1",
-            ExportScale="1e3",
-            name="VtkExporter",
-            ExportFileType=".vtk",
-            ExportEveryNSteps=self.ra("EXPORT_STEP"),
-            Filename=self.ra("MESH_EXPORTED"),
-            ExportStartStep=self.ra("START_EXPORT_STEP"),
-            ExportSigmaC=False,
-            ExportEc=False,
-            ExportE1d=False,
-            # exportVelocity=1,
-            # exportAcceleration=1,
-            contraction_forcefield="@contraction",
-        )
+        if "EXPORT_CONFIG" in self.params:
+            config = self.ra("EXPORT_CONFIG")
+            self.add_exports(self.endo_exports() if config == "endo" else config)
+        else:
+            node.addObject(
+                "CardiacSimulationExporter",
+                Tetras="1",
+                ExportScale="1e3",
+                name="VtkExporter",
+                ExportFileType=".vtk",
+                ExportEveryNSteps=self.ra("EXPORT_STEP"),
+                Filename=self.ra("MESH_EXPORTED"),
+                ExportStartStep=self.ra("START_EXPORT_STEP"),
+                ExportSigmaC=False,
+                ExportEc=False,
+                ExportE1d=False,
+                # exportVelocity=1,
+                # exportAcceleration=1,
+                contraction_forcefield="@contraction",
+            )
+
+    def endo_exports(self) -> ExportConfig:
+        """
+        Endocardial surfaces every EXPORT_STEP in float32 and the cavity
+        pressures and volumes every step
+        """
+        every = int(self.ra("EXPORT_STEP"))
+        fields = {
+            f"endo{side}": FieldExport(
+                "MecaNode/mecaObj", "position", every, zone, dtype="float32"
+            )
+            for side, zone in (
+                ("L", self.ra("LV_ENDO_ZONE")),
+                ("R", self.ra("RV_ENDO_ZONE")),
+            )
+        }
+        fields.update({k: FieldExport(*v) for k, v in PV_FIELDS.items()})
+        return ExportConfig(fields, loader="MecaNode/loader")
 
     def build_coupling_node(self):
         node = self.root.addChild("Coupling")
@@ -251,9 +293,9 @@ class MecaScene(BaseScene):
             rayleighMass="0",
         )
         node.addObject("Gravity", gravity="0 0 0", tags="tagContraction")
-        node.addObject(
-            "CGLinearSolver",
-            name="linear-solver-coupling",
+        self.add_linear_solver(
+            node,
+            "linear-solver-coupling",
             template="GraphScattered",
             tags="tagContraction",
             iterations=100,
@@ -0,0 +1,219 @@
+import glob
+import logging
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import treefiles as tf
+
+from SofaModel.stopping import StoppingCriterion, read
+
+# Data of the PressureConstraintForceField monitored per ventricle
+PV_FIELDS = {
+    "pressureL": ("MecaNode/pressureforceL", "pressure"),
+    "volumeL": ("MecaNode/pressureforceL", "volume"),
+    "pressureR": ("MecaNode/pressureforceR", "pressure"),
+    "volumeR": ("MecaNode/pressureforceR", "volume"),
+}
+
+
+class CycleMonitor(StoppingCriterion):
+    """
+    Stop the run once the heart reached its limit cycle: every signal is
+    averaged per phase bin over each beat of `period`, and the run stops when
+    two consecutive beats differ by less than `tol` (relative to the signal
+    range). The converged beat is saved to converged_beat.npz and, with
+    `keep_last_beat_only`, the exports of the steps before it are removed.
+    """
+
+    CONVERGED = True
+    STATE = (
+        "beat",
+        "beats",
+        "diffs",
+        "beat_first_step",
+        "_last_check",
+        "_since",
+        "_x0",
+        "_sum",
+        "_count",
+    )
+
+    def __init__(
+        self,
+        period: float,
+        tol: float = 1e-2,
+        fields: Optional[Dict[str, Tuple[str, str]]] = None,
+        displacement: Optional[str] = None,
+        bins: int = 100,
+        min_beats: int = 2,
+        keep_last_beat_only: bool = True,
+        every: int = 1,
+    ):
+        """
+        :param displacement: path of a MechanicalObject whose mean displacement
+            from the first step is monitored too, e.g. "MecaNode/mecaObj"
+        """
+        super().__init__(every)
+        self.period = float(period)
+        self.tol = tol
+        self.fields = PV_FIELDS if fields is None else fields
+        self.displacement = displacement
+        self.bins = bins
+        self.min_beats = min_beats
+        self.keep_last_beat_only = keep_last_beat_only
+
+        self.beat = None
+        self.beats = []  # mean trace per completed beat, (bins, n_signals)
+        self.diffs = []
+        self.beat_first_step = []  # first model step of each beat
+        self._last_check = 0
+        self._since = 0.0  # file server time of the start, see prune
+        self._x0 = None
+        self._sum = None
+        self._count = None
+
+    def start(self, model):
+        if self.keep_last_beat_only and "MESH_EXPORTED" in model.params:
+            self._since = _clock(os.path.dirname(str(model.params.MESH_EXPORTED.value)))
+
+    @property
+    def names(self):
+        return list(self.fields) + (["displacement"] if self.displacement else [])
+
+    def signals(self, model) -> np.ndarray:
+        values = [float(np.mean(read(model, p, d))) for p, d in self.fields.values()]
+        if self.displacement:
+            x = np.array(read(model, self.displacement, "position"), dtype=float)
+            if self._x0 is None:
+                self._x0 = x
+            values.append(float(np.linalg.norm(x - self._x0, axis=-1).mean()))
+        return np.array(values)
+
+    def _new_beat(self, beat, step: int):
+        self.beat = beat
+        self.beat_first_step.append(step)
+        self._sum = np.zeros((self.bins, len(self.names)))
+        self._count = np.zeros(self.bins)
+
+    def _close_beat(self) -> Optional[float]:
+        with np.errstate(invalid="ignore"):
+            trace = self._sum / self._count[:, None]
+        self.beats.append(trace)
+        if len(self.beats) < 2:
+            return
+        prev = self.beats[-2]
+        scale = np.nanmax(prev, axis=0) - np.nanmin(prev, axis=0)
+        scale[scale == 0] = 1
+        diff = float(np.nanmax(np.abs(trace - prev) / scale))
+        self.diffs.append(diff)
+        log.info(f"Beat {len(self.beats)}: difference with previous beat {diff:.3g}")
+        return diff
+
+    def check(self, model):
+        t = model.root.time.value
+        beat, phase = divmod(t, self.period)
+        # with every > 1 the beat started after the previous check, the steps in
+        # between are kept with it
+        first, self._last_check = self._last_check + 1, model.step
+        if self.beat is None:
+            self._new_beat(beat, first)
+        elif beat != self.beat:
+            diff = self._close_beat()
+            self._new_beat(beat, first)
+            if (
+                diff is not None
+                and len(self.beats) >= self.min_beats
+                and diff < self.tol
+            ):
+                return (
+                    f"limit cycle: beat {len(self.beats)} differs from the previous "
+                    f"one by {diff:.3g} < {self.tol:g}"
+                )
+
+        i = min(int(phase / self.period * self.bins), self.bins - 1)
+        self._sum[i] += self.signals(model)
+        self._count[i] += 1
+
+    def finish(self, model):
+        out = model.params.out_dir.value
+        tf.dump_json(
+            os.path.join(str(out), "cycle_monitor.json"),
+            {
+                "period": self.period,
+                "tol": self.tol,
+                "beats": len(self.beats),
+                "diffs": self.diffs,
+                "converged": model.stop_reason is not None
+                and model.stop_reason.startswith("limit cycle"),
+            },
+            cls=tf.JsonEncoder,
+        )
+        if not self.diffs or self.diffs[-1] >= self.tol:
+            return
+
+        np.savez(
+            os.path.join(str(out), "converged_beat.npz"),
+            phase=(np.arange(self.bins) + 0.5) / self.bins * self.period,
+            names=np.array(self.names),
+            trace=self.beats[-1],
+        )
+        if self.keep_last_beat_only:
+            removed = self.prune(model, self.beat_first_step[-2])
+            log.info(f"Removed {removed} exports of the transient beats")
+
+    def prune(self, model, first: int) -> int:
+        """
+        Remove the exports of this run for the steps before `first`, selected by
+        step or frame number. Returns the number of removed files or frames
+        """
+        removed = []
+        n_frames = 0
+        exporter = getattr(model.scene, "exporter", None)
+        if exporter is not None:  # EXPORT_CONFIG, frames of the result stores
+            exporter.close_exports()
+            n_frames = exporter.drop(first)
+        p = model.params
+        if "MESH_EXPORTED" in p and "EXPORT_CONFIG" not in p:
+            # CardiacSimulationExporter numbers its frames in order, one every
+            # EXPORT_STEP steps from START_EXPORT_STEP. Files older than the run
+            # (by the file server clock) belong to other runs
+            start = int(p.START_EXPORT_STEP.value) if "START_EXPORT_STEP" in p else 0
+            every = int(p.EXPORT_STEP.value) if "EXPORT_STEP" in p else 1
+            frames = [
+                f
+                for f in glob.glob(f"{p.MESH_EXPORTED.value}*")
+                if _number(f) is not None and os.path.getmtime(f) >= self._since
+            ]
+            frames.sort(key=_number)
+            removed.extend(frames[: len(range(start, first, every))])
+        for f in removed:
+            os.remove(f)
+        return n_frames + len(removed)
+
+
+def _number(path) -> Optional[int]:
+    """
+    Last number of a file name, the step or frame of an export
+    """
+    numbers = re.findall(r"\d+", os.path.basename(str(path)))
+    return int(numbers[-1]) if numbers else None
+
+
+def _clock(directory) -> float:
+    """
+    Current time of the file server of `directory`, 0 if it does not exist yet
+    """
+    if not os.path.isdir(directory or "."):
+        return 0.0
+    stamp = os.path.join(directory or ".", f".clock{os.getpid()}")
+    with open(stamp, "w"):
+        pass
+    try:
+        return os.path.getmtime(stamp)
+    finally:
+        os.remove(stamp)
+
+
+log = logging.getLogger(__name__)
@@ -1,15 +1,63 @@
 import logging
+import os
 
 import treefiles as tf
 from Model3D import Analyser
 
-from basesofamodel.base_model import BaseModel
+from SofaModel import BaseModel
+from SofaModel.cache import InputCache
+from mecamodel.features import PVFeatures
 from mecamodel.main_scene import MecaScene
+from mecamodel.monitor import CycleMonitor
+
+
+INPUT_FILES = (
+    "MESH_PATH",
+    "FIBERS_PATH",
+    "STIFFNESS_FILE",
+    "CONTRACTION_FILE",
+    "ELECTRO_FILE",
+    "CONDUCTIVITY_FILE",
+)
 
 
 class MecaModel(BaseModel):
+    # Keep the pressure/volume traces along the per beat features
+    KEEP_PV_TRACES = False
+
+    def init(self):
+        self.features = None
+        if "HEART_PERIOD" in self.params:
+            self.features = PVFeatures(
+                float(self.params.HEART_PERIOD.value), traces=self.KEEP_PV_TRACES
+            )
+            self.hooks.append(self.features)
+
+    def set_data_path(self):
+        # Share the input files of a sweep through the cache, set INPUT_CACHE to
+        # the cache directory (shared by every run) to enable. Links are named
+        # after the content so the run registry key follows input changes, the
+        # content digests are memoized by the cache so each input is read once
+        if "INPUT_CACHE" not in self.params:
+            return
+        cache = InputCache(self.params.INPUT_CACHE.value)
+        inputs = tf.dump(self.out / "inputs")
+        for key in INPUT_FILES:
+            src = str(self.params[key].value)
+            if not tf.isfile(src):
+                continue
+            digest = cache.key("file", files=[src])
+            dst = inputs / f"{digest[:16]}_{os.path.basename(src)}"
+            self.params.add(key, cache.add_file(src, dst))
+
+    def get_features(self) -> dict:
+        """
+        Per beat features computed during the run, see PVFeatures
+        """
+        return tf.load_json(self.out / "features.json")
+
     def plot(self):
-        an = Analyser(self.params.out.value)
+        an = Analyser(self.params.out_dir.value)
         an.get_features()
         an.left.plot_raw()
 
@@ -25,11 +73,15 @@ if __name__ == "__main__":
 
     params.add("n", int(eval(params.NUMBER_STEPS.value)))
     params.add("dt", float(params.DT.value))
-    params.add("out", params.SIMULATION_FOLDER.value)
+    params.add("out_dir", params.SIMULATION_FOLDER.value)
     params.add("WK_order", 4)
     # print(params.table())
 
-    model = MecaModel(params, MecaScene)
-    model.run(std_to_file=True, gui=True)
+    model = MecaModel(params, MecaScene())
+    # batch run, the GUI loop does not call the run hooks
+    model.run(
+        std_to_file=True,
+        stop=[CycleMonitor(float(params.HEART_PERIOD.value), tol=1e-3)],
+    )
 
     # model.plot()
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("SOFA_ROOT", os.path.join(ROOT, "benchmarks", "fake_sofa"))
+
+
+@pytest.fixture
+def mesh(tmp_path):
+    """
+    Small tetrahedral grid of the benchmarks, as a legacy vtk file
+    """
+    from bench import tetra_grid, write_vtk
+
+    path = str(tmp_path / "mesh.vtk")
+    write_vtk(path, *tetra_grid(2))
+    return path
@@ -0,0 +1,61 @@
+"""
+Scenes of the tests, importable by the spawned sweep workers
+"""
+import os
+import signal
+
+from bench import BenchScene
+from SofaModel.export import ExportConfig, FieldExport
+
+
+class CrashScene(BenchScene):
+    """
+    Kills its process like a SOFA segfault when the `crash` parameter is set
+    """
+
+    def init(self):
+        if self.ra("crash"):
+            os.kill(os.getpid(), signal.SIGSEGV)
+        super().init()
+
+
+class ExportScene(BenchScene):
+    def init(self):
+        super().init()
+        self.add_exports(
+            ExportConfig({"x": FieldExport("meca/dofs", "position", every=2)})
+        )
+
+
+class TwoRateScene(BenchScene):
+    """
+    Two copies of the bench mesh, "fast" sub-cycled against "slow"
+    """
+
+    SUBSTEPS = {"fast": 3}
+    INTERPOLATE = {"fast": [("slow/dofs", "position")]}
+
+    def init(self):
+        r = self.root
+        r.addObject("MeshVTKLoader", name="loader", filename=self.ra("mesh"))
+        for name in ("slow", "fast"):
+            n = r.addChild(name)
+            n.addObject("EulerImplicitSolver", name="solver")
+            n.addObject("CGLinearSolver", name="cg", iterations=25)
+            n.addObject(
+                "TetrahedronSetTopologyContainer",
+                name="topo",
+                tetrahedra="@../loader.tetrahedra",
+            )
+            n.addObject("MechanicalObject", name="dofs", position="@../loader.position")
+            n.addObject("TetrahedronFEMForceField", name="fem", youngModulus=1e3)
+
+        if self.ra("export"):
+            from SofaModel.sofa_deps import StoreExporter
+
+            self.controller = StoreExporter(
+                r,
+                path=os.path.join(str(self.ra("out_dir")), "results.bin"),
+                fields={"position": ("slow/dofs", "position")},
+            )
+            r.addObject(self.controller)
@@ -0,0 +1,32 @@
+import json
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+tf = pytest.importorskip("treefiles")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# wall times vary between machines, only a several-fold slowdown fails
+TOLERANCE = float(os.environ.get("SOFAMODEL_BENCH_TOLERANCE", 4.0))
+
+
+def test_against_baseline(tmp_path):
+    import bench
+
+    if "fake_sofa" not in os.environ["SOFA_ROOT"]:
+        pytest.skip("the baseline is measured with the fake backend")
+    with open(os.path.join(ROOT, "benchmarks", "baseline.json")) as f:
+        baseline = json.load(f)
+
+    cases = []
+    for ref in baseline["cases"]:
+        # a fresh process per case, as bench.main does
+        with ProcessPoolExecutor(1, mp_context=mp.get_context("spawn")) as pool:
+            case = pool.submit(
+                bench.bench_case, ref["res"], ref["steps"], str(tmp_path)
+            ).result()
+        assert (case["nodes"], case["tetrahedra"]) == (ref["nodes"], ref["tetrahedra"])
+        cases.append(case)
+    assert bench.compare({"cases": cases}, baseline, TOLERANCE)
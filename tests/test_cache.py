@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+import pytest
+
+from SofaModel.cache import InputCache
+
+
+def _writer(text, calls=None, delay=0.0):
+    def create(path):
+        if calls is not None:
+            calls.append(path)
+        time.sleep(delay)
+        with open(path, "w") as f:
+            f.write(text)
+
+    return create
+
+
+def test_concurrent_creators_wait_for_the_first(tmp_path):
+    cache = InputCache(tmp_path / "cache")
+    key = cache.key("mesh", 1)
+    calls, paths = [], []
+    create = _writer("mesh", calls, delay=0.2)
+
+    threads = [
+        threading.Thread(
+            target=lambda: paths.append(cache.get_or_create(key, "mesh.vtk", create))
+        )
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len(set(paths)) == 1 and open(paths[0]).read() == "mesh"
+
+
+def test_files_added_to_an_entry(tmp_path):
+    cache = InputCache(tmp_path / "cache")
+    key = cache.key("inputs")
+    a = cache.get_or_create(key, "a.txt", _writer("a"))
+    b = cache.get_or_create(key, "b.txt", _writer("b"))
+    assert os.path.dirname(a) == os.path.dirname(b)
+    assert open(a).read() == "a" and open(b).read() == "b"
+
+
+def test_lru_eviction(tmp_path):
+    cache = InputCache(tmp_path / "cache", max_bytes=150)
+    old = cache.get_or_create(cache.key("old"), "f", _writer("x" * 100))
+    os.utime(os.path.dirname(old), (0, 0))
+    new = cache.get_or_create(cache.key("new"), "f", _writer("y" * 100))
+
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+
+
+def test_locked_entry_not_evicted(tmp_path):
+    cache = InputCache(tmp_path / "cache", max_bytes=150)
+    key = cache.key("old")
+    old = cache.get_or_create(key, "f", _writer("x" * 100))
+    os.utime(os.path.dirname(old), (0, 0))
+
+    with cache.lock(key):  # being replaced by another worker
+        cache.get_or_create(cache.key("new"), "f", _writer("y" * 100))
+    assert os.path.exists(old)
+
+
+def test_fetch_recreates_an_evicted_entry(tmp_path):
+    cache = InputCache(tmp_path / "cache")
+    key = cache.key("mesh")
+    calls = []
+    dst = tmp_path / "run" / "mesh.vtk"
+    dst.parent.mkdir()
+
+    cache.fetch(key, "mesh.vtk", _writer("mesh", calls), dst)
+    os.remove(os.path.join(cache.entry(key), "mesh.vtk"))  # evicted meanwhile
+    cache.fetch(key, "mesh.vtk", _writer("mesh", calls), dst)
+
+    assert len(calls) == 2 and dst.read_text() == "mesh"
+
+
+def test_add_file_follows_the_content(tmp_path):
+    cache = InputCache(tmp_path / "cache")
+    src = tmp_path / "in.txt"
+    src.write_text("a")
+    first = cache.key("file", files=[src])
+    assert cache.key("file", files=[src]) == first  # memoized digest
+
+    src.write_text("ab")
+    os.utime(src, (1, 1))
+    dst = tmp_path / "linked.txt"
+    cache.add_file(src, dst)
+    assert cache.key("file", files=[src]) != first
+    assert dst.read_text() == "ab"
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+tf = pytest.importorskip("treefiles")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("SOFA_ROOT", os.path.join(ROOT, "benchmarks", "fake_sofa"))
+
+from bench import BenchModel, BenchScene, _params, tetra_grid, write_vtk
+
+
+def test_run_std_to_file(tmp_path, capsys):
+    mesh = str(tmp_path / "mesh.vtk")
+    write_vtk(mesh, *tetra_grid(2))
+    out = tmp_path / "out"
+    model = BenchModel(_params(str(out), mesh, 3, False), BenchScene())
+
+    with capsys.disabled():  # print to the real stdout, captured at fd level
+        model.run(std_to_file=True)
+
+    stdout = (out / "Output_Python.stdout").read_text()
+    assert "Starting 3 iterations" in stdout
+    assert (out / "Error_Python.stderr").exists()
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("treefiles")
+
+from bench import BenchModel, _params
+from scenes import ExportScene
+from SofaModel.export import read_exports
+from SofaModel.hooks import RunHook
+from SofaModel.stopping import SteadyState
+from SofaModel.store import ResultStore
+
+
+class Crash(RunHook):
+    def __init__(self, step):
+        self.step = step
+
+    def after_step(self, model):
+        if model.step == self.step:
+            raise RuntimeError("crash")
+
+
+def _run(out, mesh, crash=None, resume=False):
+    model = BenchModel(_params(str(out), mesh, 10, True), ExportScene())
+    if crash is not None:
+        model.hooks.append(Crash(crash))
+    steady = SteadyState("meca/dofs", tol=0, window=3)
+    model.run(std_to_file=True, checkpoint_every=3, resume=resume, stop=[steady])
+    return model, steady
+
+
+def test_resume_matches_uninterrupted_run(tmp_path, mesh, capsys):
+    with capsys.disabled():  # print to the real stdout, captured at fd level
+        ref, ref_steady = _run(tmp_path / "ref", mesh)
+        with pytest.raises(RuntimeError):
+            _run(tmp_path / "run", mesh, crash=7)
+        model, steady = _run(tmp_path / "run", mesh, resume=True)
+
+    assert model.step == ref.step == 10
+    assert model.root.time.value == pytest.approx(ref.root.time.value)
+
+    # result stores truncated to the checkpoint then appended to
+    a = ResultStore.open(tmp_path / "ref" / "results.bin")
+    b = ResultStore.open(tmp_path / "run" / "results.bin")
+    assert len(a) == len(b) == 11
+    np.testing.assert_allclose(a["time"], b["time"])
+    np.testing.assert_allclose(a["position"], b["position"])
+    ta, xa = read_exports(tmp_path / "ref" / "exports")["x"]
+    tb, xb = read_exports(tmp_path / "run" / "exports")["x"]
+    np.testing.assert_allclose(ta, tb)
+    np.testing.assert_allclose(xa, xb)
+
+    # hook state restored
+    assert list(steady.changes) == pytest.approx(list(ref_steady.changes))
+
+    # std files appended to
+    stdout = (tmp_path / "run" / "Output_Python.stdout").read_text()
+    assert stdout.count("Starting 10 iterations") == 2
+
+
+def test_keep_at_least_one(tmp_path):
+    from SofaModel.checkpoint import Checkpointer
+
+    with pytest.raises(ValueError):
+        Checkpointer(tmp_path, every=1, keep=0)
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+tf = pytest.importorskip("treefiles")
+
+from SofaModel.jobqueue import JobQueue
+
+
+def _stale(queue, job_id):
+    os.utime(queue.path("running", job_id), (0, 0))
+
+
+def test_claim(tmp_path):
+    queue = JobQueue(tmp_path, timeout=60)
+    ids = queue.submit([{"name": "a"}, {"name": "b"}])
+
+    first, second = queue.claim(), queue.claim()
+    assert {first["id"], second["id"]} == set(ids)
+    assert first["attempts"] == second["attempts"] == 1
+    assert first["worker"] == queue.worker
+    assert queue.claim() is None
+    assert queue.ids("pending") == [] and queue.ids("running") == sorted(ids)
+
+
+def test_claimed_job_is_not_stale(tmp_path):
+    queue = JobQueue(tmp_path, timeout=60)
+    (job_id,) = queue.submit([{"name": "a"}])
+    os.utime(queue.path("pending", job_id), (0, 0))  # submitted long ago
+
+    queue.claim()
+    queue.requeue_stale()
+    assert queue.ids("running") == [job_id]
+
+
+@pytest.mark.parametrize("max_attempts, state", [(2, "pending"), (1, "failed")])
+def test_requeue_stale(tmp_path, max_attempts, state):
+    queue = JobQueue(tmp_path, timeout=60, max_attempts=max_attempts)
+    (job_id,) = queue.submit([{"name": "a"}])
+    queue.claim()
+    _stale(queue, job_id)
+
+    queue.requeue_stale()
+    assert queue.ids("running") == []
+    assert queue.ids(state) == [job_id]
+
+
+def test_requeued_job_keeps_its_attempts(tmp_path):
+    queue = JobQueue(tmp_path, timeout=60, max_attempts=3)
+    (job_id,) = queue.submit([{"name": "a"}])
+    queue.claim()
+    _stale(queue, job_id)
+    queue.requeue_stale()
+
+    assert queue.claim()["attempts"] == 2
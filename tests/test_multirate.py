@@ -0,0 +1,46 @@
+import pytest
+
+tf = pytest.importorskip("treefiles")
+
+from bench import BenchModel, _params
+from scenes import TwoRateScene
+
+
+@pytest.fixture
+def solves(monkeypatch):
+    from SofaModel.load_SOFA import load_SOFA
+
+    load_SOFA()
+    from Sofa import components
+
+    calls = []
+    solve = components.EulerImplicitSolver.solve
+
+    def counted(self, node, dt, records):
+        calls.append((node.name.value, round(dt, 9)))
+        return solve(self, node, dt, records)
+
+    monkeypatch.setattr(components.EulerImplicitSolver, "solve", counted)
+    return calls
+
+
+def test_substeps(tmp_path, mesh, solves):
+    model = BenchModel(_params(str(tmp_path / "out"), mesh, 4, False), TwoRateScene())
+    model.run()
+
+    dt = model.params.dt.value
+    assert solves.count(("slow", dt)) == 4
+    assert solves.count(("fast", round(dt / 3, 9))) == 12
+    assert len(solves) == 16  # each node solved by its own steps only
+    assert model.root.time.value == pytest.approx(4 * dt)
+
+
+def test_controllers_hear_the_model_steps(tmp_path, mesh):
+    from SofaModel.store import ResultStore
+
+    out = tmp_path / "out"
+    model = BenchModel(_params(str(out), mesh, 4, True), TwoRateScene())
+    model.run()
+
+    assert model.scene.controller.step == 4
+    assert len(ResultStore.open(out / "results.bin")) == 5
@@ -0,0 +1,137 @@
+import pytest
+
+tf = pytest.importorskip("treefiles")
+
+from SofaModel.cache import InputCache
+from SofaModel.spec import SceneSpec, SpecError, coerce, references, resolve
+
+SPEC = {
+    "params": {"E": "float", "mesh": "file", "iters": {"type": "int", "default": 25}},
+    "children": [
+        {
+            "name": "meca",
+            "objects": [
+                {"type": "MeshVTKLoader", "name": "loader", "filename": "$mesh"},
+                {"type": "CGLinearSolver", "name": "cg", "iterations": "$iters"},
+                {"type": "MechanicalObject", "name": "mo", "src": "@loader"},
+                {
+                    "type": "TetrahedronFEMForceField",
+                    "name": "fem",
+                    "youngModulus": {"$sum": ["$E", 1]},
+                    "tags": "E${E}",
+                },
+            ],
+            "children": [
+                {
+                    "name": "sub",
+                    "objects": [
+                        {"type": "MechanicalObject", "position": "@../mo.position"}
+                    ],
+                }
+            ],
+        }
+    ],
+}
+
+
+def _params(**values):
+    params = tf.Params()
+    for k, v in values.items():
+        params.add(k, v)
+    return params
+
+
+def _objects(graph, node=0):
+    objects = graph["children"][node]["objects"]
+    return {o["kwargs"]["name"]: o["kwargs"] for o in objects}
+
+
+def test_resolve():
+    lookup = {"a": 2, "b": "x"}.__getitem__
+    assert resolve("$a", lookup) == 2
+    assert resolve("n${a}_${b}", lookup) == "n2_x"
+    assert resolve({"$join": ["$a", "$b", 3]}, lookup) == "2 x 3"
+    assert resolve({"$sum": ["$a", 0.5]}, lookup) == 2.5
+    assert resolve("$$a", lookup) == "$a"
+    assert resolve({"k": ["$a"]}, lookup) == {"k": [2]}
+    assert references({"k": ["$a", "${b}", "$$c"]}) == {"a", "b"}
+
+
+def test_coerce():
+    assert coerce("3", "int") == 3
+    assert coerce(" 1e3 ", "float") == 1000.0
+    assert coerce("false", "bool") is False
+    for value, kind in (("x", "float"), (True, "int"), (1.5, "int"), ("yes", "bool")):
+        with pytest.raises(ValueError):
+            coerce(value, kind)
+
+
+def test_compile(mesh):
+    graph = SceneSpec(SPEC).compile(_params(E="3", mesh=mesh))
+    objects = _objects(graph)
+    assert objects["loader"]["filename"] == mesh
+    assert objects["cg"]["iterations"] == 25  # default
+    assert objects["fem"]["youngModulus"] == 4.0  # numeric string converted
+    assert objects["fem"]["tags"] == "E3.0"
+
+
+def test_compile_through_cache(tmp_path, mesh):
+    spec, params = SceneSpec(SPEC), _params(E=3.0, mesh=mesh)
+    cache = InputCache(tmp_path / "cache")
+    assert spec.compile(params, cache) == spec.compile(params, cache)
+    assert spec.compile(params, cache) == spec.compile(params)
+
+
+def test_structure_errors():
+    bad = {
+        "foo": 1,
+        "params": {"E": "complex"},
+        "objects": [{"type": "A", "name": "x"}, {"type": "B", "name": "x"}, {}],
+        "children": [{"objects": []}],
+    }
+    with pytest.raises(SpecError) as e:
+        SceneSpec(bad)
+    text = str(e.value)
+    for error in (
+        "unknown key 'foo'",
+        "unknown type",
+        "duplicated name 'x'",
+        "expected an object with a 'type'",
+        "expected a node",
+    ):
+        assert error in text
+
+
+def test_param_errors(mesh):
+    with pytest.raises(SpecError) as e:
+        SceneSpec(SPEC).compile(_params(E="x", mesh=mesh + ".missing"))
+    assert len(e.value.errors) == 2
+    with pytest.raises(SpecError, match="missing parameter 'mesh'"):
+        SceneSpec(SPEC).compile(_params(E=1.0))
+
+
+@pytest.mark.parametrize(
+    "link, ok",
+    [
+        ("@loader", True),
+        ("@loader.position", True),
+        ("@/meca/mo", True),
+        ("@../meca/fem", True),
+        ("@nope", False),
+        ("@/meca/sub/mo", False),
+    ],
+)
+def test_links(mesh, link, ok):
+    spec = {
+        "params": SPEC["params"],
+        "children": [dict(SPEC["children"][0])],
+    }
+    spec["children"][0]["objects"] = SPEC["children"][0]["objects"] + [
+        {"type": "MechanicalObject", "name": "extra", "position": link}
+    ]
+    compile = lambda: SceneSpec(spec).compile(_params(E=1.0, mesh=mesh))
+    if ok:
+        compile()
+    else:
+        with pytest.raises(SpecError, match="broken link"):
+            compile()
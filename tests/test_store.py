@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from SofaModel.store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "results.bin"
+    tetra = np.array([[0, 1, 2, 3]], dtype=np.int64)
+    with ResultStore.create(
+        path, {"position": ("<f8", (4, 3)), "pressure": ("<f4", ())}, tetrahedra=tetra
+    ) as s:
+        for i in range(5):
+            s.append(0.1 * i, position=np.full((4, 3), i), pressure=10 * i)
+    return path
+
+
+def test_round_trip(store):
+    s = ResultStore.open(store)
+    assert len(s) == 5
+    assert s.fields == ["position", "pressure"]
+    np.testing.assert_allclose(s["time"], 0.1 * np.arange(5))
+    assert s["position"].shape == (5, 4, 3)
+    np.testing.assert_array_equal(s["position"][3], np.full((4, 3), 3))
+    np.testing.assert_array_equal(s["pressure"], [0, 10, 20, 30, 40])
+    np.testing.assert_array_equal(s.topology("tetrahedra"), [[0, 1, 2, 3]])
+    assert s.frame(2)["pressure"] == 20
+
+
+def test_incomplete_frame_ignored(store):
+    with open(store, "ab") as f:
+        f.write(b"\0" * 10)  # crash in the middle of a frame
+    assert len(ResultStore.open(store)) == 5
+
+
+def test_append_truncate_drop(store):
+    with ResultStore.open(store, "a") as s:
+        s.truncate(3)
+        s.append(1.0, position=np.zeros((4, 3)), pressure=-1)
+        assert len(s) == 4
+        s.drop(2)
+    s = ResultStore.open(store)
+    np.testing.assert_allclose(s["time"], [0.2, 1.0])
+    np.testing.assert_array_equal(s["pressure"], [20, -1])
+    np.testing.assert_array_equal(s.topology("tetrahedra"), [[0, 1, 2, 3]])
+
+
+def test_to_vtk(store, tmp_path):
+    ResultStore.open(store).to_vtk(str(tmp_path / "frame_{i}.vtk"), frames=[1])
+    text = (tmp_path / "frame_1.vtk").read_text()
+    assert "POINTS 4 double" in text and "CELLS 1 5" in text
+    assert "SCALARS" not in text  # pressure is not a per-node field
@@ -0,0 +1,33 @@
+import pytest
+
+tf = pytest.importorskip("treefiles")
+
+from bench import BenchModel, _params
+from scenes import CrashScene
+from SofaModel.sweep import Sweep, grid
+
+
+def test_grid():
+    assert grid(a=[1, 2], b=["x"]) == [{"a": 1, "b": "x"}, {"a": 2, "b": "x"}]
+
+
+def test_crash_charged_to_its_job_only(tmp_path, mesh):
+    # run_0 kills its worker, which breaks the pool while the others run: they
+    # are resubmitted without being charged, even with no retry left
+    variants = [{"crash": i == 0} for i in range(4)]
+    sweep = Sweep(
+        BenchModel,
+        CrashScene,
+        _params(str(tmp_path / "base"), mesh, 2, False),
+        variants,
+        str(tmp_path / "sweep"),
+        workers=3,
+        std_to_file=False,
+        retries=0,
+    )
+    rows = sweep.run()
+
+    assert [r["status"] for r in rows] == ["crashed", "done", "done", "done"]
+    assert rows[0]["error"] == "worker process died"
+    assert sweep.table().endswith("3/4 runs done")
+    assert (tmp_path / "sweep" / "sweep.json").exists()